@@ -0,0 +1,109 @@
+from collections.abc import Mapping
+
+
+def format_value(value) -> str:
+    """
+    Renders one result value as text, the way it is shown in the output pane and result files.
+    """
+    # Imported here rather than at module level to keep application startup fast
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, str):
+        return value
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.to_string()
+    elif isinstance(value, np.ndarray):
+        if value.size == 1:
+            return str(value.item())
+        elif value.ndim == 1:
+            return " ".join(str(v) for v in value)
+        return np.array2string(value)
+    elif isinstance(value, dict):
+        return "\n".join(f"${name}\n{format_value(item)}\n" for name, item in value.items())
+    elif isinstance(value, list):
+        return "\n".join(format_value(item) for item in value)
+    return str(value)
+
+
+def json_value(value):
+    """
+    Converts one result value into plain JSON-serializable data. Missing numeric values become None.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, pd.DataFrame):
+        return json_value(value.to_dict(orient="split"))
+    elif isinstance(value, pd.Series):
+        return {"index": json_value(value.index.tolist()), "data": json_value(value.tolist())}
+    elif isinstance(value, pd.Categorical):
+        return json_value(value.astype(object).tolist())
+    elif isinstance(value, np.ndarray):
+        return json_value(value.tolist())
+    elif isinstance(value, dict):
+        return {str(name): json_value(item) for name, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [json_value(item) for item in value]
+    elif isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    elif isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class AnalysisResult(Mapping):
+    def __init__(self, sections: dict):
+        """
+        Typed results of one analysis run, keyed by upper-case section name.
+        Numeric objects are kept as NumPy arrays or DataFrames and character output as strings;
+        text is only rendered when a section is asked for it.
+        :param sections: Dictionary mapping each result name to its value.
+        """
+        self._sections = {key.upper(): value for key, value in sections.items()}
+        self._lines = {}
+        self.trace = None
+
+    def __getitem__(self, key):
+        return self._sections[key]
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def __getstate__(self):
+        # Rendered text is cheap to rebuild, so it isn't pickled to workers or the result cache
+        return {"_sections": self._sections, "_lines": {}, "trace": self.trace}
+
+    def with_trace(self, trace):
+        """
+        :return: A result sharing these sections, carrying the timing trace of the run that produced it.
+        """
+        result = AnalysisResult({})
+        result._sections = self._sections
+        result._lines = self._lines
+        result.trace = trace
+        return result
+
+    def section_lines(self, key: str) -> list[str]:
+        """
+        :return: The rendered text of a section, split into lines.
+        """
+        lines = self._lines.get(key)
+        if lines is None:
+            lines = self._lines[key] = format_value(self._sections[key]).split("\n")
+        return lines
+
+    def to_json(self) -> dict:
+        """
+        :return: All sections as plain JSON-serializable data.
+        """
+        return {key: json_value(value) for key, value in self._sections.items()}
+
+    def to_text(self) -> str:
+        """
+        :return: All sections rendered as text under a header line each.
+        """
+        return "".join(f"======== {key} ========\n" + "\n".join(self.section_lines(key)) + "\n" for key in self)
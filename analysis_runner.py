@@ -0,0 +1,196 @@
+import itertools
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from r_container import RAnalysisContainer, RWorkerPool
+
+
+class _JobSignals(QObject):
+    """
+    Signals emitted from the worker thread. QRunnable is not a QObject, so each job carries one of these.
+    """
+    started = pyqtSignal(int)
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+
+class AnalysisJob(QRunnable):
+    def __init__(self, job_id: int, container: RAnalysisContainer, inputs: dict, timeout: float = None,
+                 worker_pool: RWorkerPool = None, input_sets: list[dict] = None):
+        """
+        A single queued run of an analysis container.
+        :param job_id: Unique id assigned by the runner.
+        :param container: The analysis to run.
+        :param inputs: Keyword arguments passed to container.run, or the shared inputs of a batch.
+        :param timeout: Seconds the job may run before it is abandoned, or None for no limit.
+        :param worker_pool: Pool of R worker processes to run on, or None to run in this process.
+        :param input_sets: Per-run inputs of a batch run with container.run_many, or None for a single run.
+        """
+        super().__init__()
+        # The runner keeps its own reference so queued jobs can be taken back out of the pool
+        self.setAutoDelete(False)
+
+        self.job_id = job_id
+        self.container = container
+        self.inputs = inputs
+        self.timeout = timeout
+        self.worker_pool = worker_pool
+        self.input_sets = input_sets
+        self.signals = _JobSignals()
+
+        self.state = "queued"
+        self.start_time = None
+        self.future = None
+
+    @property
+    def name(self):
+        return self.container.name
+
+    def run(self):
+        if self.state != "queued":
+            return
+        self.signals.started.emit(self.job_id)
+        try:
+            if self.input_sets is not None and self.worker_pool is not None:
+                self.future = self.worker_pool.submit_many(self.container.r_script_path, self.input_sets, self.inputs)
+                result = self.future.result()
+            elif self.input_sets is not None:
+                result = self.container.run_many(self.input_sets, self.inputs)
+            elif self.worker_pool is not None:
+                self.future = self.worker_pool.submit(self.container.r_script_path, self.inputs)
+                result = self.future.result()
+            else:
+                result = self.container.run(**self.inputs)
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, result)
+
+
+class AnalysisRunner(QObject):
+    """
+    Queues analysis runs on a background thread pool and reports their progress through signals.
+    Embedded R is process-global and not thread-safe, so in-process runs are executed one at a time.
+    With a worker pool set, runs execute in parallel in the pool's R processes instead.
+    """
+    job_queued = pyqtSignal(int, str)
+    job_started = pyqtSignal(int, str)
+    job_finished = pyqtSignal(int, str, object)
+    job_failed = pyqtSignal(int, str, str)
+    job_cancelled = pyqtSignal(int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+        self.jobs: dict[int, AnalysisJob] = {}
+        self._job_ids = itertools.count(1)
+        self.worker_pool: RWorkerPool = None
+
+    def set_worker_pool(self, worker_pool: RWorkerPool):
+        """
+        Routes subsequent runs to the given pool of R worker processes, or back in-process if None.
+        """
+        self.worker_pool = worker_pool
+        self.thread_pool.setMaxThreadCount(worker_pool.num_workers if worker_pool is not None else 1)
+
+    def submit(self, container: RAnalysisContainer, inputs: dict, timeout: float = None) -> int:
+        """
+        Queues a run of the given container.
+        :param container: The analysis to run.
+        :param inputs: Keyword arguments passed to container.run.
+        :param timeout: Seconds the job may run before it is abandoned, or None for no limit.
+        :return: The id of the queued job.
+        """
+        return self._start(AnalysisJob(next(self._job_ids), container, inputs, timeout, self.worker_pool))
+
+    def submit_many(self, container: RAnalysisContainer, input_sets: list[dict], shared_inputs: dict = None,
+                    timeout: float = None) -> int:
+        """
+        Queues a batch run of the given container over several input sets, executed in a single R call.
+        The job_finished signal carries the list of results, one per input set.
+        :param container: The analysis to run.
+        :param input_sets: Keyword arguments that vary between runs.
+        :param shared_inputs: Keyword arguments common to every run.
+        :param timeout: Seconds the whole batch may run before it is abandoned, or None for no limit.
+        :return: The id of the queued job.
+        """
+        return self._start(AnalysisJob(next(self._job_ids), container, shared_inputs or {}, timeout,
+                                       self.worker_pool, input_sets))
+
+    def _start(self, job: AnalysisJob) -> int:
+        job.signals.started.connect(self._on_job_started)
+        job.signals.finished.connect(self._on_job_finished)
+        job.signals.failed.connect(self._on_job_failed)
+
+        self.jobs[job.job_id] = job
+        self.thread_pool.start(job)
+        self.job_queued.emit(job.job_id, job.name)
+        return job.job_id
+
+    def cancel(self, job_id: int):
+        """
+        Cancels a queued or running job. Jobs running on a worker pool have their worker process killed;
+        an in-process R call can't be interrupted from another thread, so its result is discarded when it returns.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.state not in ("queued", "running"):
+            return
+        if job.state == "queued":
+            self.thread_pool.tryTake(job)
+        self._stop_worker(job)
+        job.state = "cancelled"
+        self._retire(job)
+        self.job_cancelled.emit(job_id, job.name)
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def pending_count(self) -> int:
+        return sum(job.state in ("queued", "running") for job in self.jobs.values())
+
+    def _on_job_started(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is None or job.state != "queued":
+            return
+        job.state = "running"
+        job.start_time = time.perf_counter()
+        if job.timeout:
+            QTimer.singleShot(int(job.timeout * 1000), lambda: self._on_job_timeout(job_id))
+        self.job_started.emit(job_id, job.name)
+
+    def _on_job_timeout(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is None or job.state != "running":
+            return
+        job.state = "timed out"
+        self._stop_worker(job)
+        self._retire(job)
+        self.job_failed.emit(job_id, job.name, f"Timed out after {job.timeout:g} s")
+
+    def _on_job_finished(self, job_id: int, result):
+        job = self.jobs.get(job_id)
+        if job is None or job.state != "running":
+            return  # Cancelled or timed out while R was busy
+        job.state = "finished"
+        self._retire(job)
+        self.job_finished.emit(job_id, job.name, result)
+
+    def _on_job_failed(self, job_id: int, message: str):
+        job = self.jobs.get(job_id)
+        if job is None or job.state != "running":
+            return
+        job.state = "failed"
+        self._retire(job)
+        self.job_failed.emit(job_id, job.name, message)
+
+    def _stop_worker(self, job: AnalysisJob):
+        if job.worker_pool is not None and job.future is not None:
+            job.worker_pool.cancel(job.future)
+
+    def _retire(self, job: AnalysisJob):
+        # Running jobs stay referenced by the pool thread until they return, so dropping ours is safe
+        self.jobs.pop(job.job_id, None)
@@ -0,0 +1,428 @@
+"""
+Local HTTP service running the analyses of one directory on a pool of warm R workers, for other tools to call.
+
+    python analysis_service.py analysis_files --port 8765
+
+    GET    /analyses            Analyses with their input keys
+    POST   /runs                {"analysis": name, "inputs": {key: value}} queues a run, or
+                                {"analysis": name, "input_sets": [...], "shared_inputs": {...}} a batch (run_many)
+    GET    /runs/<id>           Status of a run, with its results once finished (?wait=seconds to long-poll)
+    GET    /runs/<id>/stream    Newline-delimited JSON status updates, ending with the finished run
+    DELETE /runs/<id>           Cancels a run
+    GET    /metrics             Queue depth, throughput, latency and cache statistics
+
+Runs beyond the queue limit are rejected with 429 so clients can back off. The service only listens on
+localhost (or a Unix socket).
+"""
+import argparse
+import itertools
+import json
+import os
+import socketserver
+import statistics
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from batch_runner import add_memory_limit_arguments, memory_limits_from_args
+from r_container import MemoryLimits, RWorkerPool
+from result_cache import ResultCache
+from script_registry import ScriptRegistry
+
+
+class ServiceError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisService:
+    def __init__(self, analysis_directory: str, num_workers: int = None, max_pending: int = 64,
+                 result_cache: ResultCache = None, keep_finished: int = 1000, compiled_script_directory: str = None,
+                 memory_limits: MemoryLimits = None):
+        """
+        Queues analysis runs from any number of clients on one pool of R worker processes.
+        :param analysis_directory: Directory of the .R analysis scripts served.
+        :param num_workers: Number of R worker processes, defaults to the number of CPUs.
+        :param max_pending: Queued and running runs allowed at once; further submissions are rejected.
+        :param result_cache: Cache checked before runs reach a worker.
+        :param keep_finished: Number of finished runs kept for polling.
+        :param compiled_script_directory: Directory caching byte-compiled scripts for the workers.
+        :param memory_limits: Limits on each worker's memory, past which it is cleaned up or replaced.
+        """
+        self.analysis_directory = os.path.normpath(analysis_directory)
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.script_registry = ScriptRegistry()
+        self.worker_pool = RWorkerPool(self.analysis_directory, num_workers, result_cache=result_cache,
+                                       compiled_script_directory=compiled_script_directory,
+                                       memory_limits=memory_limits)
+
+        self.runs: OrderedDict[int, dict] = OrderedDict()
+        self._run_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._pending = 0
+        self.started_at = time.time()
+        self.counts = {"submitted": 0, "rejected": 0, "ok": 0, "error": 0, "cancelled": 0}
+        self._latencies = deque(maxlen=1000)  # Seconds from submission to completion of recent runs
+
+    def analyses(self) -> dict[str, dict]:
+        """
+        :return: Dictionary mapping each analysis name to its script path and input keys.
+        """
+        self.script_registry.scan(self.analysis_directory)
+        return {os.path.basename(path)[:-2]: {"path": path, "input_keys": entry["input_keys"]}
+                for path, entry in sorted(self.script_registry.scripts_in(self.analysis_directory).items())}
+
+    def submit(self, request: dict) -> dict:
+        """
+        Validates and queues a run request.
+        :return: The run record.
+        :raise ServiceError: For malformed requests (400), unknown analyses (404) or a full queue (429).
+        """
+        name = request.get("analysis")
+        analysis = self.analyses().get(name)
+        if analysis is None:
+            raise ServiceError(404, f"Unknown analysis: {name}")
+        input_keys = set(analysis["input_keys"])
+
+        if "input_sets" in request:
+            input_sets = [_decode_inputs(inputs) for inputs in request["input_sets"]]
+            shared_inputs = _decode_inputs(request.get("shared_inputs", {}))
+            for inputs in input_sets:
+                if set(inputs) | set(shared_inputs) != input_keys or set(inputs) & set(shared_inputs):
+                    raise ServiceError(400, f"Expected inputs: {analysis['input_keys']}")
+        else:
+            inputs = _decode_inputs(request.get("inputs", {}))
+            if set(inputs) != input_keys:
+                raise ServiceError(400, f"Expected inputs: {analysis['input_keys']}, but got: {list(inputs)}")
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.counts["rejected"] += 1
+                raise ServiceError(429, f"Queue is full ({self.max_pending} runs pending)")
+            self._pending += 1
+            self.counts["submitted"] += 1
+            run = {"id": next(self._run_ids), "analysis": name, "status": "queued", "submitted_at": time.time()}
+            self.runs[run["id"]] = run
+
+        try:
+            if "input_sets" in request:
+                future = self.worker_pool.submit_many(analysis["path"], input_sets, shared_inputs)
+            else:
+                future = self.worker_pool.submit(analysis["path"], inputs)
+        except Exception as e:
+            # Nothing was queued, so give the slot back
+            with self._lock:
+                del self.runs[run["id"]]
+                self._pending -= 1
+                self.counts["submitted"] -= 1
+            raise ServiceError(400 if isinstance(e, (TypeError, ValueError)) else 500, f"Could not queue run: {e}")
+        with self._lock:
+            run["future"] = future
+        future.add_done_callback(lambda f, run_id=run["id"]: self._on_run_done(run_id, f))
+        with self._lock:
+            return dict(run)
+
+    def get(self, run_id: int, wait: float = 0) -> dict:
+        """
+        :param wait: Seconds to wait for the run to finish before returning its current state.
+        :return: A snapshot of the run record, taken while no result can be added to it.
+        :raise ServiceError: If there is no such run (404).
+        """
+        deadline = time.monotonic() + wait
+        with self._finished:
+            run = self.runs.get(run_id)
+            if run is None:
+                raise ServiceError(404, f"Unknown run: {run_id}")
+            while run["status"] in ("queued", "running") and time.monotonic() < deadline:
+                self._finished.wait(deadline - time.monotonic())
+            if run["status"] == "queued" and run.get("future") is not None and run["future"].running():
+                run["status"] = "running"
+            return dict(run)
+
+    def cancel(self, run_id: int) -> dict:
+        run = self.get(run_id)
+        future = run.get("future")
+        if future is not None and run["status"] in ("queued", "running"):
+            self.worker_pool.cancel(future)
+        return self.get(run_id)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            metrics = {
+                "uptime_seconds": round(time.time() - self.started_at, 3),
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "runs": dict(self.counts),
+                "workers": self.worker_pool.num_workers,
+                "workers_ready": self.worker_pool.ready.is_set(),
+            }
+        metrics["memory"] = self.worker_pool.memory_stats()
+        if latencies:
+            metrics["latency_seconds"] = {
+                "mean": round(statistics.fmean(latencies), 6),
+                "p50": round(latencies[len(latencies) // 2], 6),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 6),
+                "max": round(latencies[-1], 6),
+            }
+        if self.worker_pool.result_cache is not None:
+            metrics["cache"] = self.worker_pool.result_cache.stats()
+        return metrics
+
+    def shutdown(self):
+        self.worker_pool.shutdown()
+
+    def _on_run_done(self, run_id, future):
+        # Runs on the worker pool's dispatcher thread
+        try:
+            result = future.result()
+            status, error = "ok", None
+        except CancelledError:
+            result, status, error = None, "cancelled", "Run was cancelled"
+        except Exception as e:
+            result, status = None, "cancelled" if str(e) == "Run was cancelled" else "error"
+            error = str(e)
+
+        with self._finished:
+            run = self.runs.get(run_id)
+            if run is None:
+                return
+            run["status"] = status
+            run["finished_at"] = time.time()
+            if error is not None:
+                run["error"] = error
+            else:
+                run["result"] = result
+            self._pending -= 1
+            self.counts[status] += 1
+            self._latencies.append(run["finished_at"] - run["submitted_at"])
+
+            # Forget the oldest finished runs beyond the retention limit
+            finished = [old_id for old_id, old_run in self.runs.items() if old_run["status"] not in ("queued", "running")]
+            for old_id in finished[:max(0, len(finished) - self.keep_finished)]:
+                del self.runs[old_id]
+            self._finished.notify_all()
+
+
+def run_record(run: dict) -> dict:
+    """
+    :return: The run as JSON-serializable data, with its results once finished.
+    """
+    record = {key: value for key, value in run.items() if key not in ("future", "result")}
+    result = run.get("result")
+    if isinstance(result, list):
+        record["results"] = [item.to_json() for item in result]
+        traces = [item.trace.to_record() for item in result[:1] if item.trace is not None]
+    elif result is not None:
+        record["results"] = result.to_json()
+        traces = [result.trace.to_record()] if result.trace is not None else []
+    else:
+        traces = []
+    if traces:
+        record["trace"] = traces[0]
+    return record
+
+
+def _decode_inputs(inputs: dict) -> dict:
+    """
+    Converts JSON input values to what RAnalysisContainer accepts: numbers become one-element vectors and
+    objects of equal-length arrays become DataFrames. Arrays are checked to convert to R vectors or matrices
+    here, so malformed ones are rejected before they take a queue slot.
+    """
+    if not isinstance(inputs, dict):
+        raise ServiceError(400, "Inputs must be a JSON object")
+    decoded = {}
+    for key, value in inputs.items():
+        if isinstance(value, (int, float, bool)):
+            value = [value]
+        elif isinstance(value, dict):
+            import pandas as pd
+            try:
+                value = pd.DataFrame(value)
+            except ValueError as e:
+                raise ServiceError(400, f"Input {key}: {e}")
+        elif isinstance(value, list):
+            _check_array(key, value)
+        elif not isinstance(value, str):
+            raise ServiceError(400, f"Input {key}: unsupported value {value!r}")
+        decoded[key] = value
+    return decoded
+
+
+def _check_array(key, value: list):
+    import numpy as np
+
+    try:
+        values = np.asarray(value)
+    except ValueError as e:
+        raise ServiceError(400, f"Input {key}: {e}")
+    if values.dtype.kind == "O" and not all(isinstance(v, str) or v is None for v in values.ravel()):
+        raise ServiceError(400, f"Input {key}: arrays must be rectangular and hold numbers, booleans or strings")
+    if values.dtype.kind in "US" and not all(isinstance(v, str) for v in value):
+        raise ServiceError(400, f"Input {key}: arrays can't mix strings with other values")
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    service: AnalysisService = None  # Set on the subclass created by make_server
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def do_DELETE(self):
+        self._handle(self._delete)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            method(parts, parse_qs(url.query))
+        except ServiceError as e:
+            headers = {"Retry-After": "1"} if e.status == 429 else {}
+            self._send_json(e.status, {"error": str(e)}, headers)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def _get(self, parts, query):
+        if parts == ["analyses"]:
+            self._send_json(200, self.service.analyses())
+        elif parts == ["metrics"]:
+            self._send_json(200, self.service.metrics())
+        elif len(parts) == 2 and parts[0] == "runs":
+            try:
+                wait = float(query.get("wait", ["0"])[0])
+            except ValueError:
+                raise ServiceError(400, f"Invalid wait: {query['wait'][0]}")
+            self._send_json(200, run_record(self.service.get(self._run_id(parts[1]), min(wait, 300))))
+        elif len(parts) == 3 and parts[0] == "runs" and parts[2] == "stream":
+            self._stream(self._run_id(parts[1]))
+        else:
+            raise ServiceError(404, f"No such endpoint: {self.path}")
+
+    def _post(self, parts, query):
+        if parts != ["runs"]:
+            raise ServiceError(404, f"No such endpoint: {self.path}")
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise ServiceError(400, f"Invalid JSON: {e}")
+        if not isinstance(request, dict):
+            raise ServiceError(400, "Request must be a JSON object")
+        run = self.service.submit(request)
+        self._send_json(202, run_record(run), {"Location": f"/runs/{run['id']}"})
+
+    def _delete(self, parts, query):
+        if len(parts) != 2 or parts[0] != "runs":
+            raise ServiceError(404, f"No such endpoint: {self.path}")
+        self._send_json(200, run_record(self.service.cancel(self._run_id(parts[1]))))
+
+    def _stream(self, run_id):
+        run = self.service.get(run_id)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        last_status = None
+        while True:
+            run = self.service.get(run_id, wait=1.0)
+            if run["status"] != last_status or run["status"] not in ("queued", "running"):
+                last_status = run["status"]
+                self.wfile.write((json.dumps(run_record(run)) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            if run["status"] not in ("queued", "running"):
+                break
+        self.close_connection = True
+
+    @staticmethod
+    def _run_id(text):
+        try:
+            return int(text)
+        except ValueError:
+            raise ServiceError(404, f"Unknown run: {text}")
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+        def server_bind(self):
+            if os.path.exists(self.server_address):
+                os.remove(self.server_address)  # Left over from an earlier run
+            super().server_bind()
+else:
+    _UnixHTTPServer = None
+
+
+def make_server(service: AnalysisService, host: str = "127.0.0.1", port: int = 8765, unix_socket: str = None):
+    """
+    :return: A threading HTTP server for the service, listening on the TCP address or the Unix socket.
+    """
+    handler = type("RequestHandler", (_RequestHandler,), {"service": service})
+    if unix_socket:
+        if _UnixHTTPServer is None:
+            raise RuntimeError("Unix sockets aren't supported on this platform")
+        return _UnixHTTPServer(unix_socket, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Serve the analyses of a directory over local HTTP.")
+    arg_parser.add_argument("analysis_directory", help="Directory containing the .R analysis scripts")
+    arg_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: localhost only)")
+    arg_parser.add_argument("--port", type=int, default=8765, help="TCP port, 0 to pick a free one")
+    arg_parser.add_argument("--unix-socket", default=None, help="Listen on this Unix socket instead of TCP")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="Number of R worker processes (default: number of CPUs)")
+    arg_parser.add_argument("--max-pending", type=int, default=64,
+                            help="Queued and running runs allowed before submissions are rejected")
+    arg_parser.add_argument("--cache-directory", default=None,
+                            help="Persist the result cache and byte-compiled scripts in this directory")
+    add_memory_limit_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+
+    compiled_script_directory = os.path.join(args.cache_directory, "compiled_scripts") if args.cache_directory else None
+    service = AnalysisService(args.analysis_directory, args.jobs, args.max_pending,
+                              ResultCache(cache_directory=args.cache_directory),
+                              compiled_script_directory=compiled_script_directory,
+                              memory_limits=memory_limits_from_args(args))
+    server = make_server(service, args.host, args.port, args.unix_socket)
+    address = args.unix_socket or "http://%s:%d" % server.server_address[:2]
+    print(f"Serving {service.analysis_directory} on {address}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from data_ingest import ingest_file
+from r_container import MemoryLimits, RAnalysisContainer, RWorkerPool
+
+
+def find_scripts(analysis_directory: str, pattern: str = "*.R") -> list[str]:
+    return sorted(os.path.normpath(path) for path in glob.glob(os.path.join(analysis_directory, pattern)))
+
+
+def find_data_files(patterns: list[str]) -> list[str]:
+    """
+    Expands data file arguments, which may be plain paths or glob patterns (shells on Windows don't expand them).
+    """
+    data_files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        data_files.extend(os.path.normpath(path) for path in matches)
+    return data_files
+
+
+def load_data_file(data_file: str) -> dict:
+    """
+    Parses a whitespace, CSV or TSV data file into typed columns, laid out as the GUI loads it.
+    :return: Dictionary mapping each field name to its column of values.
+    """
+    return ingest_file(data_file).fields
+
+
+def run_batch(analysis_directory: str, data_files: list[str], jobs: int = None, script_pattern: str = "*.R",
+              include_results: bool = True, compiled_script_directory: str = None,
+              memory_limits: MemoryLimits = None, trace_r_memory: bool = False):
+    """
+    Runs every script in the analysis directory against every data file on a pool of R workers.
+    Fields are matched to a script's inputs by position, as in the GUI; pairs whose field count doesn't match
+    the script's inputs are reported as skipped. Scripts without a process_data function (shared helpers) are
+    left out, as in the GUI.
+    Data files are loaded as runs are submitted, with at most two runs per worker in flight, so records stream
+    out while later files are still being read and only the data of pending runs is held in memory.
+    Workers load byte-compiled scripts from compiled_script_directory, if given, instead of sourcing them, and
+    are replaced when they go over the memory limits. Each run's trace records the worker's RSS, and with
+    trace_r_memory its R heap (which costs a full R garbage collection per run).
+    :return: Generator of one record per (script, data file) pair, in completion order.
+    """
+    containers = []
+    for path in find_scripts(analysis_directory, script_pattern):
+        try:
+            container = RAnalysisContainer(path)
+        except (OSError, ValueError) as e:
+            print("Skipping analysis script", path, ":", e, file=sys.stderr)
+            continue
+        container.name = os.path.splitext(os.path.basename(path))[0]
+        containers.append(container)
+
+    worker_pool = RWorkerPool(analysis_directory, jobs, compiled_script_directory=compiled_script_directory,
+                              memory_limits=memory_limits, trace_r_memory=trace_r_memory)
+    max_in_flight = worker_pool.num_workers * 2
+    try:
+        # One submitting thread per worker, so each run is timed from the moment a worker picks it up
+        with ThreadPoolExecutor(max_workers=worker_pool.num_workers) as executor:
+            futures = {}
+            for data_file in data_files:
+                record = {"data_file": data_file}
+                try:
+                    fields = load_data_file(data_file)
+                except (OSError, ValueError) as e:
+                    for container in containers:
+                        yield {"script": container.name, **record, "status": "error", "error": str(e)}
+                    continue
+
+                for container in containers:
+                    if len(fields) != len(container.input_keys):
+                        yield {"script": container.name, **record, "status": "skipped",
+                               "error": f"{len(fields)} fields for inputs {container.input_keys}"}
+                        continue
+                    if len(futures) >= max_in_flight:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield _finish_record(futures.pop(future), future, include_results)
+                    inputs = dict(zip(container.input_keys, fields.values()))
+                    future = executor.submit(_timed_run, worker_pool, container.r_script_path, inputs)
+                    futures[future] = {"script": container.name, **record}
+
+            for future in as_completed(futures):
+                yield _finish_record(futures[future], future, include_results)
+    finally:
+        worker_pool.shutdown()
+
+
+def add_memory_limit_arguments(arg_parser: argparse.ArgumentParser):
+    arg_parser.add_argument("--cleanup-above-mb", type=float, default=None,
+                            help="Clear a worker's R global environment and session cache above this RSS")
+    arg_parser.add_argument("--recycle-after-runs", type=int, default=None,
+                            help="Replace each worker with a fresh process after this many runs")
+    arg_parser.add_argument("--recycle-above-mb", type=float, default=None,
+                            help="Replace a worker whose RSS stays above this after cleanup")
+
+
+def memory_limits_from_args(args) -> MemoryLimits:
+    return MemoryLimits(args.cleanup_above_mb, args.recycle_after_runs, args.recycle_above_mb)
+
+
+def _timed_run(worker_pool, r_script_path, inputs):
+    start = time.perf_counter()
+    try:
+        result = worker_pool.submit(r_script_path, inputs).result()
+    except Exception as e:
+        return time.perf_counter() - start, None, str(e)
+    return time.perf_counter() - start, result, None
+
+
+def _finish_record(record: dict, future, include_results: bool) -> dict:
+    seconds, result, error = future.result()
+    record["seconds"] = round(seconds, 6)
+    if error is None:
+        record["status"] = "ok"
+        if result.trace is not None:
+            record["trace"] = result.trace.to_record()
+        if include_results:
+            record["results"] = result.to_json()
+    else:
+        record["status"] = "error"
+        record["error"] = error
+    return record
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Run every analysis script against every data file without the GUI, "
+                    "writing one JSON record per run.")
+    arg_parser.add_argument("analysis_directory", help="Directory containing the .R analysis scripts")
+    arg_parser.add_argument("data_files", nargs="+", help="Data files or glob patterns")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="Number of R worker processes (default: number of CPUs)")
+    arg_parser.add_argument("-o", "--output", default=None, help="JSONL file to write (default: stdout)")
+    arg_parser.add_argument("--scripts", default="*.R", help="Glob selecting scripts in the analysis directory")
+    arg_parser.add_argument("--no-results", action="store_true", help="Only record status and timing")
+    arg_parser.add_argument("--compiled-scripts", default=None,
+                            help="Directory caching byte-compiled scripts across runs")
+    arg_parser.add_argument("--trace-r-memory", action="store_true",
+                            help="Record the R heap in each run's trace (runs a full R garbage collection per run)")
+    add_memory_limit_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+
+    data_files = find_data_files(args.data_files)
+    output = open(args.output, "w") if args.output else sys.stdout
+    failures = 0
+    try:
+        for record in run_batch(args.analysis_directory, data_files, args.jobs, args.scripts,
+                                include_results=not args.no_results,
+                                compiled_script_directory=args.compiled_scripts,
+                                memory_limits=memory_limits_from_args(args),
+                                trace_r_memory=args.trace_r_memory):
+            failures += record["status"] == "error"
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
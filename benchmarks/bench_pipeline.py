@@ -0,0 +1,202 @@
+"""
+Benchmarks the analysis hot path stage by stage: parsing the input text, converting inputs to R,
+executing process_data, converting and cleaning its output, and formatting the result text.
+"execute" runs with an empty session object store every repeat; "execute_warm" times repeats that find the
+intermediates a script stores with session_cache() already there.
+
+    python benchmarks/bench_pipeline.py -o bench_new.json
+    python benchmarks/bench_pipeline.py --max-exponent 5 --stages parse,convert --compare bench_old.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from input_parser import IncrementalParser  # noqa: E402
+
+STAGES = ["parse", "convert", "execute", "execute_warm", "to_python", "clean", "format"]
+SCRIPTS = ["testing_josh_analysis.R"]
+
+
+def generate_dataset(rows: int, seed: int = 0) -> str:
+    """
+    Generates a whitespace-delimited dataset shaped like some_data.txt: x and y columns, plus a new_x
+    value on the first line.
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(10, 40, rows).round(1)
+    y = (150 + 2.5 * x + rng.normal(0, 5, rows)).round(1)
+    lines = [f"{a:7.1f}{b:7.1f}" for a, b in zip(y, x)]
+    lines[0] += "   30"
+    return "\n".join(lines)
+
+
+def time_call(function, repeats: int, setup=None):
+    """
+    :param setup: Called untimed before every repeat.
+    """
+    timings = []
+    value = None
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        value = function()
+        timings.append(time.perf_counter() - start)
+    return timings, value
+
+
+def bench_parse(text: str, repeats: int):
+    def parse():
+        parser = IncrementalParser()
+        parser.reset(text)
+        return parser.fields()
+
+    return time_call(parse, repeats)
+
+
+def bench_r_stages(script_path: str, fields: dict, stages: list[str], repeats: int):
+    """
+    Times the R stages of one run of the script, each in isolation on the previous stage's output.
+    :return: Dictionary mapping each stage name to its timings.
+    """
+    import r_container
+
+    container = r_container.RAnalysisContainer(script_path)
+    r_func = container._load_script()
+    inputs = dict(zip(container.input_keys, fields.values()))
+    timings = {}
+
+    convert_timings, r_inputs = time_call(
+        lambda: [container._convert_to_r_type(inputs[key]) for key in container.input_keys], repeats)
+    timings["convert"] = convert_timings
+
+    # Cold runs stay comparable with reports from before scripts could keep intermediates between runs
+    execute_timings, r_result = time_call(lambda: r_func(*r_inputs), repeats,
+                                          setup=container.clear_session_cache)
+    timings["execute"] = execute_timings
+    if "execute_warm" in stages:
+        timings["execute_warm"], _ = time_call(lambda: r_func(*r_inputs), repeats)
+
+    to_python_timings, result_dict = time_call(
+        lambda: {name: r_container._r_to_python(r_result[i]) for i, name in enumerate(r_result.names)}, repeats)
+    timings["to_python"] = to_python_timings
+
+    clean_timings, result = time_call(lambda: container._clean_output(result_dict), repeats)
+    timings["clean"] = clean_timings
+
+    # Formatting is cached per result, so time it on a fresh result every repeat
+    timings["format"], _ = time_call(lambda: container._clean_output(result_dict).to_text(), repeats)
+
+    return {stage: stage_timings for stage, stage_timings in timings.items() if stage in stages}
+
+
+def summarize(stage: str, script: str, rows: int, timings: list[float]) -> dict:
+    return {
+        "stage": stage,
+        "script": script,
+        "rows": rows,
+        "repeats": len(timings),
+        "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings),
+    }
+
+
+def run_benchmarks(sizes: list[int], stages: list[str], repeats: int, analysis_directory: str):
+    results = []
+    for rows in sizes:
+        text = generate_dataset(rows)
+        parse_timings, fields = bench_parse(text, repeats)
+        if "parse" in stages:
+            results.append(summarize("parse", None, rows, parse_timings))
+            print(f"parse {rows:>10} rows: {min(parse_timings):.4f} s", file=sys.stderr)
+
+        r_stages = [stage for stage in stages if stage != "parse"]
+        if not r_stages:
+            continue
+        for script in SCRIPTS:
+            script_path = os.path.join(analysis_directory, script)
+            for stage, timings in bench_r_stages(script_path, fields, r_stages, repeats).items():
+                results.append(summarize(stage, script, rows, timings))
+                print(f"{stage} {script} {rows:>10} rows: {min(timings):.4f} s", file=sys.stderr)
+    return results
+
+
+def environment_info() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    info = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+    if "rpy2.robjects" in sys.modules:
+        info["r_version"] = sys.modules["rpy2.robjects"].r("R.version.string")[0]
+    return info
+
+
+def compare_reports(base: dict, new: dict):
+    """
+    Prints the median time of every stage in both reports and the ratio new/base.
+    """
+    base_results = {(r["stage"], r["script"], r["rows"]): r for r in base["results"]}
+    print(f"{'stage':<12} {'script':<26} {'rows':>10} {'base (s)':>10} {'new (s)':>10} {'ratio':>7}")
+    for result in new["results"]:
+        key = (result["stage"], result["script"], result["rows"])
+        if key not in base_results:
+            continue
+        base_seconds = base_results[key]["seconds_median"]
+        new_seconds = result["seconds_median"]
+        ratio = new_seconds / base_seconds if base_seconds else float("inf")
+        print(f"{key[0]:<12} {key[1] or '-':<26} {key[2]:>10} {base_seconds:>10.4f} {new_seconds:>10.4f} "
+              f"{ratio:>7.2f}")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the parse/convert/execute/clean pipeline.")
+    arg_parser.add_argument("--min-exponent", type=int, default=3, help="Smallest dataset is 10^N rows")
+    arg_parser.add_argument("--max-exponent", type=int, default=7, help="Largest dataset is 10^N rows")
+    arg_parser.add_argument("--stages", default=",".join(STAGES),
+                            help=f"Comma-separated stages to time (default: {','.join(STAGES)})")
+    arg_parser.add_argument("--repeats", type=int, default=3, help="Timed repeats per stage")
+    arg_parser.add_argument("--analysis-directory", default=os.path.join(REPO_ROOT, "analysis_files"))
+    arg_parser.add_argument("-o", "--output", default=None, help="JSON report to write (default: stdout)")
+    arg_parser.add_argument("--compare", default=None, help="Earlier JSON report to compare against")
+    args = arg_parser.parse_args(argv)
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown_stages = set(stages) - set(STAGES)
+    if unknown_stages:
+        arg_parser.error(f"Unknown stages: {', '.join(sorted(unknown_stages))}")
+
+    sizes = [10 ** exponent for exponent in range(args.min_exponent, args.max_exponent + 1)]
+    results = run_benchmarks(sizes, stages, args.repeats, args.analysis_directory)
+    report = {"environment": environment_info(), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import math
+from array import array
+
+# Rows per block. Statistics are kept per block and merged, so an edit only recomputes the blocks it touches.
+BLOCK_ROWS = 65536
+
+# Points kept by each quantile sketch
+SKETCH_SIZE = 256
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+class QuantileSketch:
+    def __init__(self, values, weights):
+        """
+        Fixed-size, mergeable summary of a distribution: sorted sample points, each standing for a weight of
+        values. A block is summarized by evenly spaced order statistics, and sketches are merged by resampling
+        their combined points at evenly spaced cumulative weights.
+        :param values: Sorted sample points (NumPy array).
+        :param weights: Number of values each point stands for.
+        """
+        self.values = values
+        self.weights = weights
+
+    @classmethod
+    def from_values(cls, values, size: int = SKETCH_SIZE):
+        import numpy as np
+
+        values = np.sort(values)
+        if len(values) <= size:
+            return cls(values, np.ones(len(values)))
+        indices = ((np.arange(size) + 0.5) * len(values) / size).astype(np.int64)
+        return cls(values[indices], np.full(size, len(values) / size))
+
+    @classmethod
+    def merge(cls, sketches: list, size: int = SKETCH_SIZE):
+        import numpy as np
+
+        values = np.concatenate([sketch.values for sketch in sketches]) if sketches else np.empty(0)
+        weights = np.concatenate([sketch.weights for sketch in sketches]) if sketches else np.empty(0)
+        order = np.argsort(values, kind="stable")
+        values, weights = values[order], weights[order]
+        if len(values) <= size:
+            return cls(values, weights)
+        cumulative = np.cumsum(weights)
+        targets = (np.arange(size) + 0.5) * cumulative[-1] / size
+        indices = np.minimum(np.searchsorted(cumulative, targets), len(values) - 1)
+        return cls(values[indices], np.full(size, cumulative[-1] / size))
+
+    def quantile(self, q: float) -> float:
+        import numpy as np
+
+        if not len(self.values):
+            return math.nan
+        if np.all(self.weights == 1):
+            # Still holds every value, so this is exact and matches R's default quantile()
+            return float(np.quantile(self.values, q))
+        # Each point sits at the middle of the weight it stands for; beyond the outer points np.interp clamps
+        cumulative = np.cumsum(self.weights)
+        return float(np.interp(q * cumulative[-1], cumulative - self.weights / 2, self.values))
+
+
+class ColumnStats:
+    def __init__(self, count: int = 0, missing: int = 0, minimum: float = math.nan, maximum: float = math.nan,
+                 mean: float = math.nan, m2: float = 0.0, sketch: QuantileSketch = None):
+        """
+        Summary statistics of a field, or of one block of it.
+        :param count: Number of values.
+        :param missing: Values that are missing or not numeric. The other statistics cover the numeric values.
+        :param m2: Sum of squared deviations from the mean, which merges exactly across blocks.
+        :param sketch: Quantile sketch of the numeric values.
+        """
+        self.count = count
+        self.missing = missing
+        self.minimum = minimum
+        self.maximum = maximum
+        self.mean = mean
+        self.m2 = m2
+        self.sketch = sketch
+
+    @property
+    def numeric(self) -> int:
+        return self.count - self.missing
+
+    @property
+    def std(self) -> float:
+        """
+        Sample standard deviation, as R's sd() computes it.
+        """
+        return math.sqrt(self.m2 / (self.numeric - 1)) if self.numeric > 1 else math.nan
+
+    def quantile(self, q: float) -> float:
+        if self.sketch is None:
+            return math.nan
+        # The sketch only keeps sample points, but the extremes are known exactly
+        return min(max(self.sketch.quantile(q), self.minimum), self.maximum) if 0 < q < 1 else \
+            (self.minimum if q <= 0 else self.maximum)
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Computes the statistics of a block in one vectorized pass.
+        :param values: NumPy array, or list of parsed values (floats, strings and None).
+        """
+        import numpy as np
+
+        if isinstance(values, np.ndarray):
+            numeric = values.astype(np.float64, copy=False)
+        else:
+            numeric = np.fromiter((value for value in values
+                                   if isinstance(value, (int, float)) and not isinstance(value, bool)),
+                                  np.float64)
+        numeric = numeric[~np.isnan(numeric)]
+        if not len(numeric):
+            return cls(len(values), len(values))
+        mean = float(numeric.mean())
+        return cls(len(values), len(values) - len(numeric), float(numeric.min()), float(numeric.max()), mean,
+                   float(np.square(numeric - mean).sum()), QuantileSketch.from_values(numeric))
+
+    @classmethod
+    def merge(cls, blocks: list):
+        """
+        Combines the statistics of consecutive blocks (pairwise-update formula for the mean and m2).
+        """
+        import numpy as np
+
+        numeric_blocks = [block for block in blocks if block.numeric]
+        count = sum(block.count for block in blocks)
+        missing = sum(block.missing for block in blocks)
+        if not numeric_blocks:
+            return cls(count, missing)
+
+        sizes = np.array([block.numeric for block in numeric_blocks], dtype=np.float64)
+        means = np.array([block.mean for block in numeric_blocks])
+        mean = float((sizes * means).sum() / sizes.sum())
+        m2 = float(sum(block.m2 for block in numeric_blocks) + (sizes * np.square(means - mean)).sum())
+        return cls(count, missing, min(block.minimum for block in numeric_blocks),
+                   max(block.maximum for block in numeric_blocks), mean, m2,
+                   QuantileSketch.merge([block.sketch for block in numeric_blocks]))
+
+
+class ColumnStatsTracker:
+    def __init__(self, block_rows: int = BLOCK_ROWS):
+        """
+        Keeps the statistics of every field up to date as the data changes. Statistics are cached per block of
+        rows; on update() only blocks whose values changed (compared against the previous columns, or marked
+        by mark_cells() for values patched in place) are recomputed, and the rest are merged from the cache.
+        """
+        self.block_rows = block_rows
+        self.stats: dict[str, ColumnStats] = {}  # Field name -> statistics of the whole field
+
+        self._columns: dict = {}  # Field name -> column the cached blocks were computed from
+        self._blocks: dict[str, list[ColumnStats]] = {}
+        self._dirty_blocks: dict[str, set[int]] = {}
+
+    def update(self, fields: dict) -> dict[str, ColumnStats]:
+        """
+        :param fields: Dictionary mapping each field name to its column of values.
+        :return: Dictionary mapping each field name to its statistics.
+        """
+        stats = {}
+        blocks = {}
+        for name, column in fields.items():
+            old_column = self._columns.get(name)
+            old_blocks = self._blocks.get(name, [])
+            dirty_blocks = self._dirty_blocks.pop(name, set())
+            values = _block_source(column)
+            old_values = _block_source(old_column) if old_column is not None and old_column is not column else None
+
+            column_blocks = []
+            for block, start in enumerate(range(0, len(values), self.block_rows)):
+                block_values = values[start:start + self.block_rows]
+                unchanged = block < len(old_blocks) and block not in dirty_blocks and \
+                    old_blocks[block].count == len(block_values) and \
+                    (old_values is None or _same_values(old_values[start:start + self.block_rows], block_values))
+                column_blocks.append(old_blocks[block] if unchanged else ColumnStats.from_values(block_values))
+            blocks[name] = column_blocks
+            stats[name] = ColumnStats.merge(column_blocks)
+
+        self._columns = dict(fields)
+        self._blocks = blocks
+        self._dirty_blocks = {}
+        self.stats = stats
+        return stats
+
+    def mark_cells(self, cells: list[tuple[int, int]]):
+        """
+        Marks the blocks of values patched in place for recomputation by the next update().
+        :param cells: (column, row) of every changed value, columns counted in field order.
+        """
+        names = list(self._columns)
+        for column, row in cells:
+            if column < len(names):
+                self._dirty_blocks.setdefault(names[column], set()).add(row // self.block_rows)
+
+
+def _block_source(column):
+    """
+    :return: The column as something sliceable into blocks without copying: a NumPy view of array('d')
+             buffers, NumPy arrays themselves, and lists as they are.
+    """
+    if isinstance(column, array) and column.typecode == "d":
+        import numpy as np
+        return np.frombuffer(column, dtype=np.float64) if len(column) else np.empty(0)
+    return column
+
+
+def _same_values(old_values, new_values) -> bool:
+    import numpy as np
+
+    if isinstance(old_values, np.ndarray) != isinstance(new_values, np.ndarray):
+        return False
+    if isinstance(new_values, np.ndarray):
+        if old_values.dtype != new_values.dtype:
+            return False
+        return np.array_equal(old_values, new_values, equal_nan=new_values.dtype.kind == "f")
+    return old_values == new_values
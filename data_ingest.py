@@ -0,0 +1,196 @@
+from array import array
+
+from input_parser import parse_line, parse_value
+
+# Bytes of the file shown in the input editor
+PREVIEW_BYTES = 256 * 1024
+
+# Lines inspected to detect the delimiter, header and column count
+SNIFF_LINES = 200
+
+DELIMITERS = [",", "\t", ";", "|"]
+
+
+class IngestedData:
+    def __init__(self, fields: dict, row_count: int, preview: str, preview_complete: bool, delimiter: str,
+                 has_header: bool):
+        """
+        Typed columns of a data file, and the start of its text for display.
+        :param fields: Dictionary mapping each field name to its column. Numeric columns are NumPy arrays,
+                       anything else a list.
+        :param row_count: Length of the longest column.
+        :param preview: Text of the first lines of the file.
+        :param preview_complete: Whether the preview is the whole file.
+        :param delimiter: Field delimiter, or None for runs of whitespace.
+        :param has_header: Whether the first line held the field names.
+        """
+        self.fields = fields
+        self.row_count = row_count
+        self.preview = preview
+        self.preview_complete = preview_complete
+        self.delimiter = delimiter
+        self.has_header = has_header
+
+    @property
+    def editable(self) -> bool:
+        """
+        Whether the preview holds the whole file in the format the input editor parses, so it can be edited
+        there instead.
+        """
+        return self.preview_complete and self.delimiter is None and not self.has_header
+
+
+def sniff_format(lines: list[str]) -> tuple[str, bool]:
+    """
+    Detects the layout of delimited text from its first lines. A delimiter is picked if it appears the same,
+    nonzero number of times on every line; otherwise fields are separated by whitespace. The first line is a
+    header if it has a non-numeric value in a column whose later values are all numeric.
+    :return: The delimiter (None for whitespace) and whether the first line is a header.
+    """
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return None, False
+
+    delimiter = None
+    for candidate in DELIMITERS:
+        counts = {line.count(candidate) for line in lines}
+        if len(counts) == 1 and counts.pop() > 0:
+            delimiter = candidate
+            break
+
+    rows = [split_line(line, delimiter) for line in lines]
+    has_header = False
+    if len(rows) > 1:
+        for i, token in enumerate(rows[0]):
+            later_values = [parse_value(row[i]) for row in rows[1:] if i < len(row) and row[i]]
+            if isinstance(parse_value(token), str) and later_values and \
+                    not any(isinstance(value, str) for value in later_values):
+                has_header = True
+                break
+    return delimiter, has_header
+
+
+def split_line(line: str, delimiter: str = None) -> list[str]:
+    if delimiter is None:
+        return line.split()
+    return [token.strip().strip('"') for token in line.rstrip("\r\n").split(delimiter)]
+
+
+def read_preview(file_path: str, max_bytes: int = PREVIEW_BYTES) -> tuple[str, bool]:
+    """
+    :return: The text of the first whole lines of the file, up to max_bytes, and whether that is the whole file.
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(max_bytes + 1)
+    complete = len(head) <= max_bytes
+    if not complete:
+        head = head[:head.rfind(b"\n", 0, max_bytes) + 1] or head[:max_bytes]
+    return head.decode("utf-8", errors="replace"), complete
+
+
+def ingest_file(file_path: str, chunk_rows: int = 1_000_000) -> IngestedData:
+    """
+    Reads a whitespace, CSV or TSV data file straight into typed column arrays. The file is memory-mapped
+    and parsed chunk by chunk by pandas' C parser, so its text is never held in memory as a whole.
+    Whitespace-delimited files follow the input editor's layout: field n holds the n-th value of every
+    line that has one, so shorter lines don't leave gaps.
+    :param file_path: File to read.
+    :param chunk_rows: Lines parsed per chunk.
+    """
+    preview, preview_complete = read_preview(file_path)
+    sample_lines = preview.splitlines()[:SNIFF_LINES]
+    delimiter, has_header = sniff_format(sample_lines)
+
+    if delimiter is None:
+        sample_rows = [line.split() for line in sample_lines if line.strip()]
+        column_count = max((len(row) for row in sample_rows), default=0)
+        names = sample_rows[0] if has_header and sample_rows else None
+    else:
+        first_row = split_line(next((line for line in sample_lines if line.strip()), ""), delimiter)
+        column_count = len(first_row)
+        names = first_row if has_header else None
+    if names is None:
+        names = [f"Field {i + 1}" for i in range(column_count)]
+
+    try:
+        columns = _read_columns(file_path, delimiter, has_header, column_count, chunk_rows)
+    except ValueError:
+        if delimiter is not None:
+            raise
+        # Lines past the sample have more values than any before them; parse the way the editor does
+        columns = _read_whitespace_columns(file_path, has_header)
+        names += [f"Field {i + 1}" for i in range(len(names), len(columns))]
+
+    fields = dict(zip(_unique_names(names), columns))
+    row_count = max((len(column) for column in columns), default=0)
+    return IngestedData(fields, row_count, preview, preview_complete, delimiter, has_header)
+
+
+def _read_columns(file_path, delimiter, has_header, column_count, chunk_rows):
+    import numpy as np
+    import pandas as pd
+
+    if column_count == 0:
+        return []
+    # Only empty fields (and the padding of short whitespace-delimited lines) are missing values;
+    # tokens like "NA" are kept as text, as in the input editor
+    reader = pd.read_csv(file_path, sep=r"\s+" if delimiter is None else delimiter, engine="c",
+                         header=None, skiprows=1 if has_header else 0, names=range(column_count),
+                         keep_default_na=False, na_values=[""], skip_blank_lines=True, memory_map=True,
+                         chunksize=chunk_rows)
+
+    chunks = [[] for _ in range(column_count)]
+    with reader:
+        for frame in reader:
+            for i in range(column_count):
+                column = frame[i]
+                if delimiter is None:
+                    column = column[column.notna()]
+                if pd.api.types.is_numeric_dtype(column.dtype):
+                    chunks[i].append(column.to_numpy())
+                else:
+                    chunks[i].append(column.to_numpy(dtype=object))
+
+    def text_column_value(value):
+        if isinstance(value, str):
+            return parse_value(value)
+        return None if pd.isna(value) else float(value)
+
+    columns = []
+    for column_chunks in chunks:
+        if not column_chunks:
+            columns.append(np.empty(0))
+        elif all(chunk.dtype != object for chunk in column_chunks):
+            columns.append(np.concatenate(column_chunks))
+        else:
+            # Text columns (or numeric ones that turn to text in a later chunk) are kept as lists like the editor's
+            columns.append([text_column_value(value) for chunk in column_chunks for value in chunk])
+    return columns
+
+
+def _read_whitespace_columns(file_path, has_header):
+    columns = []
+    with open(file_path, "r") as f:
+        if has_header:
+            f.readline()
+        for line in f:
+            row = parse_line(line)
+            while len(columns) < len(row):
+                columns.append([])
+            for i, value in enumerate(row):
+                columns[i].append(value)
+    return [column if any(isinstance(v, str) for v in column) else array('d', column) for column in columns]
+
+
+def _unique_names(names):
+    seen = {}
+    unique = []
+    for name in names:
+        name = str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 1
+        unique.append(name)
+    return unique
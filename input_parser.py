@@ -0,0 +1,97 @@
+from array import array
+
+
+def parse_value(token: str):
+    """
+    Converts a token to a float when possible, otherwise keeps it as a string.
+    """
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def parse_line(line: str) -> list:
+    return [parse_value(token) for token in line.split()]
+
+
+class IncrementalParser:
+    def __init__(self):
+        """
+        Keeps the parsed rows of a whitespace-delimited document and the field columns built from them,
+        so edits only re-parse the lines they touch.
+        Column n holds the n-th value of every line that has one. Fully numeric columns are stored as
+        array('d') buffers, anything else as a list.
+        """
+        self.rows: list[list] = []
+        self.columns: list = []
+        self.dirty = True
+
+        # Per column, the position in the column of each line's value (-1 if the line is too short)
+        self._offsets: list[list[int]] = []
+
+    def reset(self, text: str):
+        """
+        Re-parses the whole document.
+        """
+        self.rows = [parse_line(line) for line in text.split("\n")]
+        self.dirty = True
+
+    def replace_lines(self, first: int, removed_count: int, new_lines: list[str]) -> list[tuple[int, int]]:
+        """
+        Replaces a range of lines with newly edited ones, re-parsing only those lines.
+        When the edit keeps every line's value count, the columns are patched in place; otherwise
+        they are marked dirty and rebuilt by the next call to rebuild().
+        :param first: Index of the first edited line.
+        :param removed_count: Number of lines the edit replaced.
+        :param new_lines: Text of the lines that replace them.
+        :return: (column, position) of every patched value, empty if the columns are dirty.
+        """
+        new_rows = [parse_line(line) for line in new_lines]
+        old_rows = self.rows[first:first + removed_count]
+        self.rows[first:first + removed_count] = new_rows
+
+        if self.dirty or len(old_rows) != len(new_rows) or \
+                any(len(old_row) != len(new_row) for old_row, new_row in zip(old_rows, new_rows)):
+            self.dirty = True
+            return []
+
+        patched = []
+        for line, row in enumerate(new_rows, start=first):
+            for i, value in enumerate(row):
+                column = self.columns[i]
+                if isinstance(column, array) and isinstance(value, str):
+                    # The column is no longer numeric, so its buffer type changes
+                    self.dirty = True
+                    return []
+                position = self._offsets[i][line]
+                column[position] = value
+                patched.append((i, position))
+        return patched
+
+    def rebuild(self):
+        """
+        Rebuilds the columns and line offsets from the parsed rows.
+        """
+        columns = []
+        offsets = []
+        for line, row in enumerate(self.rows):
+            while len(columns) < len(row):
+                columns.append([])
+                offsets.append([-1] * len(self.rows))
+            for i, value in enumerate(row):
+                offsets[i][line] = len(columns[i])
+                columns[i].append(value)
+
+        self.columns = [column if any(isinstance(v, str) for v in column) else array('d', column)
+                        for column in columns]
+        self._offsets = offsets
+        self.dirty = False
+
+    def fields(self) -> dict:
+        """
+        :return: Dictionary mapping each field name to its column.
+        """
+        if self.dirty:
+            self.rebuild()
+        return {f"Field {i + 1}": column for i, column in enumerate(self.columns)}
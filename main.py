@@ -1,27 +1,80 @@
-import os
-import sys
+import time
 
-from PyQt5.QtCore import QSettings, Qt
-from PyQt5.QtGui import QStandardItemModel, QStandardItem
-from PyQt5.QtWidgets import QApplication, QWidget, QFileDialog, QLineEdit, QTextEdit, QCheckBox
+# Taken before any other import, so --startup-timing covers the cost of importing the application
+_LAUNCH_TIME = time.perf_counter()
 
-from r_container import RAnalysisContainer
+import copy
+import os
+import sys
+import threading
+
+from PyQt5.QtCore import QFileSystemWatcher, QMetaObject, QSettings, QStandardPaths, Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QWidget, QFileDialog, QLineEdit, QCheckBox, QComboBox
+
+from analysis_result import AnalysisResult
+from analysis_runner import AnalysisRunner
+from column_stats import ColumnStatsTracker
+from data_ingest import IngestedData, ingest_file
+from input_parser import IncrementalParser
+from output_renderer import ChunkedOutputRenderer
+from parsed_data_model import ColumnStatsModel, ParsedDataModel
+from r_container import MemoryLimits, RAnalysisContainer, RWorkerPool
+from result_cache import ResultCache
+from result_writer import ResultWriter
+from run_trace import RunTrace, export_chrome_trace
+from script_registry import ScriptRegistry
+from settings_store import CoalescedSettings
 from ui.analysis_widget_init import Ui_AnalysisWidget
 from ui.main_window_init import Ui_MainWindow
 
+# "python main.py --startup-timing" prints how long each phase of startup took, then quits once warmed up.
+# Worker processes re-import this module under another name, and stay quiet.
+STARTUP_TIMING = __name__ == "__main__" and "--startup-timing" in sys.argv
+
+# Each R worker is a full embedded R process, so the GUI keeps its pool small however many CPUs there are
+MAX_R_WORKERS = 4
+
+
+def log_startup(milestone: str):
+    if STARTUP_TIMING:
+        print(f"[startup] {(time.perf_counter() - _LAUNCH_TIME) * 1000:8.1f} ms  {milestone}", file=sys.stderr)
+
+
+def warm_up_imports():
+    """
+    Imports the numeric libraries that input fingerprinting and result formatting need, so the first run
+    doesn't pay for them.
+    """
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+
+
+log_startup("imports done")
+
 
 class MainWindow(QWidget):
+    # Emitted from the result writer's thread
+    result_write_failed = pyqtSignal(str)
+    # Emitted from the file loading thread: (load generation, file path, IngestedData or the exception raised,
+    # ColumnStatsTracker holding the statistics of the file's fields)
+    input_file_ingested = pyqtSignal(int, str, object, object)
+
     def __init__(self):
         super().__init__()
         # Initialize ui
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
+        log_startup("ui set up")
 
         # Connect buttons to functionality
         self.ui.data_file_browse_button.clicked.connect(self.select_data_file)
         self.ui.output_file_browse_button.clicked.connect(self.select_save_location)
         self.ui.analysis_directory_browse_button.clicked.connect(self.select_analysis_directory)
         self.ui.load_from_file_button.clicked.connect(self.load_input_data_to_display)
+        self.ui.cancel_runs_button.clicked.connect(self.cancel_runs)
+        self.ui.run_all_button.clicked.connect(self.run_all_analyses)
+        self.ui.export_trace_button.clicked.connect(self.export_run_traces)
+        self.ui.load_more_output_button.clicked.connect(self.load_more_output)
 
         # Connect checkbox to functionality
         self.ui.save_to_file_checkbox.toggled.connect(self.update_save_to_file_enabled)
@@ -29,15 +82,89 @@ class MainWindow(QWidget):
         # Connecting text changed signals
         self.ui.file_path_line_edit.editingFinished.connect(self.load_input_data_to_display)
         self.ui.analysis_directory_line_edit.editingFinished.connect(self.populate_analyses)
-        self.ui.input_data_text_edit.textChanged.connect(self.parse_input_data)
 
         # Other variables
-        self.analysis_containers = {}
+        self.analysis_containers: dict[str, RAnalysisContainer] = {}
+        self.analysis_widgets: dict[str, QWidget] = {}
         self.parsed_input_data: dict = {}
-
-        # Autosaving/loading on initialization
+        app_data_directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+
+        # Analysis scripts are indexed on disk and watched, so only scripts that change are reloaded
+        self.script_registry = ScriptRegistry(os.path.join(app_data_directory, "script_index.json"))
+        self.watched_analysis_directory: str = None
+        self.script_watcher = QFileSystemWatcher(self)
+        self.script_refresh_timer = QTimer(self)
+        self.script_refresh_timer.setSingleShot(True)
+        self.script_refresh_timer.setInterval(200)
+        self.script_refresh_timer.timeout.connect(self.refresh_analyses)
+        self.script_watcher.directoryChanged.connect(self.script_refresh_timer.start)
+        self.script_watcher.fileChanged.connect(self.script_refresh_timer.start)
+
+        # Input data is re-parsed line by line as it is edited, and the parsed view is rebuilt once typing pauses
+        self.input_parser = IncrementalParser()
+        self.input_parser.reset(self.ui.input_data_text_edit.toPlainText())
+        self.parse_timer = QTimer(self)
+        self.parse_timer.setSingleShot(True)
+        self.parse_timer.setInterval(300)
+        self.parse_timer.timeout.connect(self.parse_input_data)
+        self.ui.input_data_text_edit.document().contentsChange.connect(self.on_input_data_changed)
+
+        # Data files are parsed straight into typed columns in the background (see load_input_file)
+        self.ingested_file: str = None
+        self.ingest_generation = 0
+        self.input_file_ingested.connect(self.show_ingested_file)
+
+        # Parsed data preview, rendered lazily from the parsed column buffers
+        self.parsed_data_model = ParsedDataModel(self)
+        self.ui.parsed_input_tree_view.setModel(self.parsed_data_model)
+        self.ui.parsed_input_tree_view.setRootIsDecorated(False)
+        self.ui.parsed_input_tree_view.setUniformRowHeights(True)
+
+        # Summary statistics of each field, kept up to date block by block as the data changes
+        self.column_stats_tracker = ColumnStatsTracker()
+        self.column_stats_model = ColumnStatsModel(self)
+        self.ui.column_stats_tree_view.setModel(self.column_stats_model)
+        self.ui.column_stats_tree_view.setRootIsDecorated(False)
+        self.ui.column_stats_tree_view.setUniformRowHeights(True)
+
+        # Results are memoized across runs and sessions
+        self.result_cache = ResultCache(cache_directory=os.path.join(app_data_directory, "result_cache"))
+
+        # Byte-compiled analysis scripts, so new worker processes and later launches skip sourcing them
+        self.compiled_script_directory = os.path.join(app_data_directory, "compiled_scripts")
+
+        # R sessions are cleaned up, and workers replaced, before a long day of runs exhausts memory
+        self.memory_limits = MemoryLimits(cleanup_above_mb=2048, recycle_after_runs=500, recycle_above_mb=4096)
+
+        # Results are rendered into the output a chunk at a time, with long sections collapsed
+        self.output_renderer = ChunkedOutputRenderer(self.ui.output_text_edit, parent=self)
+        self.output_renderer.more_available.connect(self.ui.load_more_output_button.setEnabled)
+
+        # Result files are written in the background by a writer created for the current output settings
+        self.result_writer: ResultWriter = None
+        self.result_writer_config = None
+        self.result_write_failed.connect(self.update_run_status)
+
+        # Background execution of analyses
+        self.worker_pool: RWorkerPool = None
+        self.batch_job_ids = set()
+        self.sweep_jobs: dict[int, tuple[str, list]] = {}  # Job id -> (swept input key, swept values)
+        self.run_traces: list[RunTrace] = []
+        self.analysis_runner = AnalysisRunner(self)
+        self.analysis_runner.job_queued.connect(lambda _, name: self.update_run_status(f"Queued {name}"))
+        self.analysis_runner.job_started.connect(lambda _, name: self.update_run_status(f"Running {name}..."))
+        self.analysis_runner.job_finished.connect(self.show_analysis_result)
+        self.analysis_runner.job_failed.connect(
+            lambda _, name, message: self.update_run_status(f"{name} failed: {message}"))
+        self.analysis_runner.job_cancelled.connect(lambda _, name: self.update_run_status(f"Cancelled {name}"))
+
+        # Autosaving/loading on initialization. Changes are written in batches, and the input data is kept
+        # as a compressed snapshot next to the settings rather than in them
         self.settings = QSettings("MyCompany", "MyApp")
+        self.settings_store = CoalescedSettings(self.settings, os.path.join(app_data_directory, "snapshots"),
+                                                parent=self)
         self.load_settings()
+        log_startup("settings loaded")
 
         # Initialize enabled widgets
         self.update_save_to_file_enabled(self.ui.save_to_file_checkbox.isChecked())
@@ -45,91 +172,319 @@ class MainWindow(QWidget):
         # Track all changes to widgets while program is open
         self.track_changes()
 
+    def start_warm_up(self):
+        """
+        Called once the window is showing. The worker pool is already starting R and preloading scripts in its
+        own processes; this imports the numeric libraries on a background thread too.
+        """
+        log_startup("window shown")
+        warm_up_thread = threading.Thread(target=self.warm_up, daemon=True)
+        warm_up_thread.start()
+
+    def warm_up(self):
+        warm_up_imports()
+        log_startup("numpy/pandas imported")
+        worker_pool = self.worker_pool
+        if worker_pool is not None:
+            worker_pool.ready.wait()
+            warm_up_seconds = ", ".join("failed" if seconds is None else f"{seconds * 1000:.0f} ms"
+                                        for seconds in worker_pool.warm_up_seconds)
+            log_startup(f"{worker_pool.num_workers} R workers ready (warm-up per worker: {warm_up_seconds})")
+        if STARTUP_TIMING:
+            # quit() has to run on the GUI thread
+            QMetaObject.invokeMethod(QApplication.instance(), "quit", Qt.QueuedConnection)
+
     def track_changes(self):
-        for widget in self.findChildren((QLineEdit, QTextEdit)):
-            widget.textChanged.connect(lambda _, w=widget: self.settings.setValue(w.objectName(), w.text()))
+        store = self.settings_store
+        for widget in self.findChildren(QLineEdit):
+            store.track(widget.objectName(), widget.text)
+            widget.textChanged.connect(lambda _, name=widget.objectName(): store.mark_dirty(name))
         for checkbox in self.findChildren(QCheckBox):
-            checkbox.stateChanged.connect(lambda _, c=checkbox: self.settings.setValue(c.objectName(), c.isChecked()))
+            store.track(checkbox.objectName(), checkbox.isChecked)
+            checkbox.stateChanged.connect(lambda _, name=checkbox.objectName(): store.mark_dirty(name))
+        for combo_box in self.findChildren(QComboBox):
+            store.track(combo_box.objectName(), combo_box.currentText)
+            combo_box.currentTextChanged.connect(lambda _, name=combo_box.objectName(): store.mark_dirty(name))
+
+        # Typed input data is snapshotted, while data loaded from a file is only referenced by its path
+        input_data_edit = self.ui.input_data_text_edit
+        store.track_snapshot(input_data_edit.objectName(),
+                             lambda: "" if self.ingested_file is not None else input_data_edit.toPlainText())
+        input_data_edit.textChanged.connect(lambda: store.mark_dirty(input_data_edit.objectName()))
+        store.track("input_data_file", lambda: self.ingested_file or "")
 
     def populate_analyses(self):
+        """
+        Shows an analysis widget for every script in the selected directory. Switching directories rebuilds the
+        list from the script registry; for the same directory only the scripts that changed are refreshed.
+        """
         analysis_directory = self.ui.analysis_directory_line_edit.text()
-        if not os.path.exists(analysis_directory):
+        if not os.path.isdir(analysis_directory):
             self.clear_analyses()
             return
+        analysis_directory = os.path.normpath(analysis_directory)
+        if analysis_directory == self.watched_analysis_directory:
+            self.refresh_analyses()
+            return
 
-        # Create analysis containers for each r file in the selected directory
-        self.analysis_containers = {}
-        for r_file in os.listdir(analysis_directory):
-            if not r_file.endswith(".R"):
-                continue
-            r_file_path = os.path.normpath(os.path.join(analysis_directory, r_file))
-            container = RAnalysisContainer(r_file_path)
-            container.name = r_file[:-2]
-            print("Created analysis container for", r_file_path, "with keys:", container.input_keys)
-            self.analysis_containers[container.name] = container
-
-            # Add analysis widget to ui
-            analysis_widget_container = QWidget()
-            analysis_widget = Ui_AnalysisWidget()
-            analysis_widget.setupUi(analysis_widget_container)
-            analysis_widget.analysis_name_label.setText(container.name)
-            analysis_widget_container.setEnabled(False)
-
-            self.ui.analysis_selection_layout.insertWidget(self.ui.analysis_selection_layout.count() - 1,
-                                                           analysis_widget_container)
-
-            # Connect run button
-            analysis_widget.analysis_run_button.clicked.connect(lambda _, c=container: self.run_analysis(c))
+        self.clear_analyses()
+        self.watched_analysis_directory = analysis_directory
+        self.script_watcher.addPath(analysis_directory)
+
+        # Start a fresh pool of R workers that preload this directory's scripts
+        self.restart_worker_pool(analysis_directory)
+
+        # Create analysis containers for each indexed r file in the selected directory
+        self.script_registry.scan(analysis_directory)
+        for r_file_path, entry in sorted(self.script_registry.scripts_in(analysis_directory).items()):
+            self.add_analysis(r_file_path, entry["input_keys"])
+        self.script_registry.save()
 
         self.update_enabled_analyses(len(self.parsed_input_data))
 
+    def refresh_analyses(self):
+        """
+        Adds, removes or refreshes only the analyses whose scripts changed on disk.
+        """
+        self.script_refresh_timer.stop()
+        analysis_directory = self.watched_analysis_directory
+        if analysis_directory is None:
+            return
+        if not os.path.isdir(analysis_directory):
+            self.clear_analyses()
+            return
+
+        added, removed, changed = self.script_registry.scan(analysis_directory)
+        entries = self.script_registry.entries
+        for r_file_path in removed:
+            self.remove_analysis(r_file_path)
+        for r_file_path in added:
+            self.add_analysis(r_file_path, entries[r_file_path]["input_keys"])
+        for r_file_path in changed:
+            container = self.analysis_containers[self.analysis_name(r_file_path)]
+            container.input_keys = list(entries[r_file_path]["input_keys"])
+            print("Refreshed analysis container for", r_file_path, "with keys:", container.input_keys)
+        if added or removed or changed:
+            self.script_registry.save()
+
+        # Editors that save by replacing the file drop it from the watcher
+        watched_files = set(self.script_watcher.files())
+        unwatched_files = [container.r_script_path for container in self.analysis_containers.values()
+                           if container.r_script_path not in watched_files]
+        if unwatched_files:
+            self.script_watcher.addPaths(unwatched_files)
+
+        self.update_enabled_analyses(len(self.parsed_input_data))
+
+    @staticmethod
+    def analysis_name(r_file_path: str) -> str:
+        return os.path.basename(r_file_path)[:-2]
+
+    def add_analysis(self, r_file_path: str, input_keys: list[str]):
+        container = RAnalysisContainer(r_file_path, input_keys)
+        container.name = self.analysis_name(r_file_path)
+        container.compiled_script_directory = self.compiled_script_directory
+        container.memory_limits = self.memory_limits
+        print("Created analysis container for", r_file_path, "with keys:", container.input_keys)
+        self.analysis_containers[container.name] = container
+
+        # Add analysis widget to ui, keeping the widgets sorted by name ahead of the trailing spacer
+        analysis_widget_container = QWidget()
+        analysis_widget = Ui_AnalysisWidget()
+        analysis_widget.setupUi(analysis_widget_container)
+        analysis_widget.analysis_name_label.setText(container.name)
+        analysis_widget_container.setEnabled(False)
+
+        index = sorted(self.analysis_containers).index(container.name)
+        self.ui.analysis_selection_layout.insertWidget(index, analysis_widget_container)
+        self.analysis_widgets[container.name] = analysis_widget_container
+
+        # Connect run button
+        analysis_widget.analysis_run_button.clicked.connect(lambda _, c=container: self.run_analysis(c))
+
+        self.script_watcher.addPath(container.r_script_path)
+
+    def remove_analysis(self, r_file_path: str):
+        name = self.analysis_name(r_file_path)
+        self.analysis_containers.pop(name, None)
+        widget = self.analysis_widgets.pop(name, None)
+        if widget is not None:
+            self.ui.analysis_selection_layout.removeWidget(widget)
+            widget.deleteLater()  # Properly delete the widget
+        if r_file_path in self.script_watcher.files():
+            self.script_watcher.removePath(r_file_path)
+        print("Removed analysis container for", r_file_path)
+
+    def restart_worker_pool(self, analysis_directory: str):
+        analysis_directory = os.path.normpath(analysis_directory) if analysis_directory else ""
+        if self.worker_pool is not None and self.worker_pool.analysis_directory == analysis_directory:
+            return
+        if self.worker_pool is not None:
+            self.analysis_runner.cancel_all()
+            # The old workers are reaped in the background rather than blocking the GUI
+            self.worker_pool.shutdown(wait=False)
+        self.worker_pool = None
+        if analysis_directory:
+            self.worker_pool = RWorkerPool(analysis_directory, min(os.cpu_count() or 1, MAX_R_WORKERS),
+                                           result_cache=self.result_cache,
+                                           compiled_script_directory=self.compiled_script_directory,
+                                           memory_limits=self.memory_limits)
+        self.analysis_runner.set_worker_pool(self.worker_pool)
+
     def clear_analyses(self):
         """
-        Removes all widgets in the analysis selection layout except the last one (e.g., a spacer).
+        Removes all analysis widgets, leaving the trailing spacer, and stops watching the analysis directory.
         """
+        self.restart_worker_pool("")
+        for widget in self.analysis_widgets.values():
+            self.ui.analysis_selection_layout.removeWidget(widget)
+            widget.deleteLater()  # Properly delete the widget
         self.analysis_containers = {}
-        layout = self.ui.analysis_selection_layout
-        count = layout.count()
-
-        # Remove all widgets except the last one
-        for i in reversed(range(count - 1)):  # Leave the last widget
-            item = layout.itemAt(i)
-            if item is not None:
-                widget = item.widget()
-                if widget is not None:
-                    layout.removeWidget(widget)
-                    widget.deleteLater()  # Properly delete the widget
-
-    def run_analysis(self, analysis_container: RAnalysisContainer):
-        required_fields = analysis_container.input_keys
-        result = analysis_container.run(
-            **{required_fields[i]: v for i, v in enumerate(self.parsed_input_data.values())})
+        self.analysis_widgets = {}
 
-        full_result_string = ""
-        for key, value in result.items():
-            full_result_string += f"======== {key} ========\n"
-            section_string = '\n'.join(value)
-            full_result_string += f"{section_string}\n"
+        watched_paths = self.script_watcher.files() + self.script_watcher.directories()
+        if watched_paths:
+            self.script_watcher.removePaths(watched_paths)
+        self.watched_analysis_directory = None
 
-        self.ui.output_text_edit.setPlainText(full_result_string)
-        if self.ui.save_to_file_checkbox.isChecked():
-            self.save_to_output_file(analysis_container.name, full_result_string)
+    def run_analysis(self, analysis_container: RAnalysisContainer) -> int:
+        """
+        Queues the analysis on the background runner; the result arrives through show_analysis_result.
+        :return: The id of the queued job, or None if the analysis no longer matches the input data.
+        """
+        self.flush_input_data()
+        if len(analysis_container.input_keys) != len(self.parsed_input_data):
+            self.update_run_status(f"{analysis_container.name} expects {len(analysis_container.input_keys)} "
+                                   f"fields, but the input data has {len(self.parsed_input_data)}")
+            return None
+        self.batch_job_ids.clear()
+        return self.submit_analysis(analysis_container)
+
+    def run_all_analyses(self):
+        """
+        Fans the current input data out to every enabled analysis at once. With the worker pool these run
+        in parallel, and each result is appended to the output as it arrives.
+        """
+        self.flush_input_data()
+        self.output_renderer.clear()
+        self.batch_job_ids = {self.submit_analysis(container) for container in self.enabled_analyses()}
 
-    def save_to_output_file(self, test_name: str, result_string: str):
-        save_dir = self.ui.output_file_path_line_edit.text()
-        if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
+    def flush_input_data(self):
+        """
+        Parses input data edits still waiting for the debounce timer, so runs see what the editor shows.
+        """
+        if self.parse_timer.isActive():
+            self.parse_input_data()
 
-        # If the file already exists, append a number to the file name
-        file_name = os.path.join(save_dir, f"{test_name}_results.txt")
+    def submit_analysis(self, analysis_container: RAnalysisContainer) -> int:
+        required_fields = analysis_container.input_keys
+        # Columns parsed from the editor are patched in place by later edits, so the worker thread gets a snapshot.
+        # Ingested file columns never change once loaded and can be very large, so they are passed as they are.
+        columns = list(self.parsed_input_data.values())
+        if self.ingested_file is None:
+            columns = [copy.copy(column) for column in columns]
+        inputs = {required_fields[i]: column for i, column in enumerate(columns)}
+        timeout = self.ui.run_timeout_spin_box.value() or None
+        if not self.ui.sweep_last_field_checkbox.isChecked() or not required_fields:
+            return self.analysis_runner.submit(analysis_container, inputs, timeout)
+
+        # Each value of the last field becomes its own run, all executed in one batch on the R side
+        sweep_key = required_fields[-1]
+        sweep_values = list(inputs.pop(sweep_key))
+        input_sets = [{sweep_key: [value]} for value in sweep_values]
+        job_id = self.analysis_runner.submit_many(analysis_container, input_sets, inputs, timeout)
+        self.sweep_jobs[job_id] = (sweep_key, sweep_values)
+        return job_id
+
+    def enabled_analyses(self) -> list[RAnalysisContainer]:
+        return [container for container in self.analysis_containers.values()
+                if len(container.input_keys) == len(self.parsed_input_data)]
+
+    def show_analysis_result(self, job_id: int, name: str, result: AnalysisResult | list[AnalysisResult]):
+        """
+        :param result: Result of a single run, or the list of results of a sweep.
+        """
+        sweep = self.sweep_jobs.pop(job_id, None)
+        results = result if isinstance(result, list) else [result]
+        trace = results[0].trace if results else None
+
+        if job_id in self.batch_job_ids:
+            self.batch_job_ids.discard(job_id)
+            self.output_renderer.append_text(f"######## {name} ########")
+        else:
+            self.output_renderer.clear()
+        if sweep is None:
+            self.output_renderer.append_result(result)
+        else:
+            sweep_key, sweep_values = sweep
+            for value, sweep_result in zip(sweep_values, results):
+                self.output_renderer.append_text(f"-------- {sweep_key} = {value} --------")
+                self.output_renderer.append_result(sweep_result)
+
+        # The first chunk is rendered right away, the rest from the event loop
+        if trace is None:
+            self.output_renderer.render_next_chunk()
+        else:
+            with trace.span("format_output"):
+                self.output_renderer.render_next_chunk()
+            self.record_run_trace(trace)
+
+        cache_stats = self.result_cache.stats()
+        self.update_run_status(f"Finished {name} (cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses)")
+        if self.ui.save_to_file_checkbox.isChecked():
+            self.save_to_output_file(name, result)
 
-        counter = 2
-        while os.path.exists(file_name):
-            file_name = os.path.join(save_dir, f"{test_name}_results_{counter}.txt")
-            counter += 1
+    def load_more_output(self):
+        self.output_renderer.load_more()
 
-        with open(file_name, "w") as f:
-            f.write(result_string)
+    def record_run_trace(self, trace: RunTrace):
+        """
+        Shows the stage timings of a run in the metrics panel and keeps the trace for export.
+        """
+        self.run_traces = self.run_traces[-199:] + [trace]
+        summary = trace.summary()
+        if self.worker_pool is not None:
+            memory = self.worker_pool.memory_stats()
+            summary += f"\nworkers: {memory['total_rss_mb']} MB RSS, {memory['recycled_workers']} recycled"
+        self.ui.run_metrics_text_edit.setPlainText(summary)
+
+    def export_run_traces(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "analysis_trace.json", "JSON (*.json)")
+        if file_path:
+            export_chrome_trace(self.run_traces, file_path)
+
+    def cancel_runs(self):
+        self.analysis_runner.cancel_all()
+
+    def update_run_status(self, message: str):
+        pending = self.analysis_runner.pending_count()
+        if pending:
+            message += f" ({pending} pending)"
+        self.ui.run_status_label.setText(message)
+
+    def save_to_output_file(self, test_name: str, result: AnalysisResult | list[AnalysisResult]):
+        """
+        Queues the result on the background result writer, which picks a free file name and writes it in the
+        selected format.
+        """
+        writer_config = (self.ui.output_file_path_line_edit.text(), self.ui.output_format_combo_box.currentText(),
+                         self.ui.append_results_checkbox.isChecked())
+        if self.result_writer is None or self.result_writer_config != writer_config:
+            # Changing the directory, format or append mode starts a new writer (and consolidated file).
+            # The old one finishes its queued writes in the background
+            if self.result_writer is not None:
+                self.result_writer.close(wait=False)
+            self.result_writer = ResultWriter(*writer_config)
+            self.result_writer_config = writer_config
+
+        for result in result if isinstance(result, list) else [result]:
+            future = self.result_writer.write(test_name, result)
+            future.add_done_callback(lambda f, name=test_name: self.check_result_written(name, f))
+
+    def check_result_written(self, test_name: str, future):
+        # Runs on the writer thread, so failures are reported to the GUI through a signal
+        if future.exception() is not None:
+            self.result_write_failed.emit(f"Could not save {test_name}: {future.exception()}")
 
     def select_data_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select File")
@@ -145,77 +500,126 @@ class MainWindow(QWidget):
         self.populate_analyses()
 
     def load_input_data_to_display(self):
-        try:
-            with open(self.ui.file_path_line_edit.text(), "r") as f:
-                data = f.read()
-            self.ui.input_data_text_edit.setPlainText(data)
-
-        except FileNotFoundError:
-            self.ui.input_data_text_edit.setPlainText("")
-
-    def parse_input_data(self):
         """
-        Parses input data as a dictionary where each field name maps to a list of values.
-        Stores the result in self.parsed_input_data.
+        Reads the selected data file into typed columns on a background thread. Small whitespace-delimited files
+        are put in the input editor as before; anything else is parsed straight from the file, and the editor
+        only shows a read-only preview.
         """
-        input_text = self.ui.input_data_text_edit.toPlainText().strip()
-        if not input_text:
-            self.parsed_input_data = {}
-            return  # No data to parse
+        self.load_input_file(self.ui.file_path_line_edit.text())
 
-        lines = input_text.split("\n")
-        parsed_data = {}
-
-        for line in lines:
-            values = line.split()
+    def load_input_file(self, file_path: str):
+        self.ingest_generation += 1
+        if not os.path.isfile(file_path):
+            self.set_editor_input("")
+            return
+        self.update_run_status(f"Loading {os.path.basename(file_path)}...")
+        threading.Thread(target=self.ingest_input_file, args=(file_path, self.ingest_generation),
+                         daemon=True).start()
 
-            # Ensure headers exist for all values
-            while len(parsed_data) < len(values):
-                field_name = f"Field {len(parsed_data) + 1}"
-                parsed_data[field_name] = []
+    def ingest_input_file(self, file_path: str, generation: int):
+        # Runs on a background thread; the result is handed to the GUI thread through a signal
+        stats_tracker = None
+        try:
+            ingested = ingest_file(file_path)
+            if not ingested.editable:
+                # Large files get their statistics here rather than on the GUI thread
+                stats_tracker = ColumnStatsTracker()
+                stats_tracker.update(ingested.fields)
+        except Exception as e:
+            ingested = e
+        self.input_file_ingested.emit(generation, file_path, ingested, stats_tracker)
+
+    def show_ingested_file(self, generation: int, file_path: str, ingested: IngestedData | Exception,
+                           stats_tracker: ColumnStatsTracker):
+        if generation != self.ingest_generation:
+            return  # A newer load was started meanwhile
+        if isinstance(ingested, Exception):
+            self.update_run_status(f"Could not load {os.path.basename(file_path)}: {ingested}")
+            return
+        self.update_run_status(f"Loaded {ingested.row_count} rows of {len(ingested.fields)} fields "
+                               f"from {os.path.basename(file_path)}")
+        if ingested.editable:
+            self.set_editor_input(ingested.preview)
+            return
 
-            # Add values to respective fields
-            for i, value in enumerate(values):
-                try:
-                    converted_value = float(value)
-                except ValueError:
-                    converted_value = value
+        # The editor shows the start of the file; edits to it would no longer match the data, so it is read-only
+        self.ingested_file = file_path
+        self.parse_timer.stop()
+        self.ui.input_data_text_edit.setReadOnly(True)
+        self.ui.input_data_text_edit.setPlainText(ingested.preview)
+        if not ingested.preview_complete:
+            self.ui.input_data_text_edit.appendPlainText(f"... (preview of {file_path})")
+        self.settings_store.mark_dirty("input_data_file")
+        self.parsed_input_data = ingested.fields
+        self.column_stats_tracker = stats_tracker
+        self.update_parsed_data_table()
 
-                parsed_data[f"Field {i + 1}"].append(converted_value)
+    def set_editor_input(self, text: str):
+        """
+        Makes the input editor the source of the input data again, holding the given text.
+        """
+        was_ingested = self.ingested_file is not None
+        self.ui.input_data_text_edit.setReadOnly(False)
+        self.ui.input_data_text_edit.setPlainText(text)
+        if was_ingested:
+            # Edits were ignored while a file was shown, so parse the new text from scratch
+            self.ingested_file = None
+            self.settings_store.mark_dirty("input_data_file")
+            self.input_parser.reset(text)
+            self.parse_input_data()
+
+    def on_input_data_changed(self, position: int, chars_removed: int, chars_added: int):
+        """
+        Re-parses only the lines touched by an edit of the input data, then restarts the debounce timer.
+        """
+        if self.ingested_file is not None:
+            return  # The data comes from the file, the editor only shows a preview
+        document = self.ui.input_data_text_edit.document()
+        first_block = document.findBlock(position)
+        last_block = document.findBlock(position + chars_added)
+        if not last_block.isValid():
+            last_block = document.lastBlock()
+
+        first = first_block.blockNumber()
+        new_count = last_block.blockNumber() - first + 1
+        removed_count = new_count - (document.blockCount() - len(self.input_parser.rows))
+
+        if not first_block.isValid() or removed_count < 0 or first + removed_count > len(self.input_parser.rows):
+            self.input_parser.reset(document.toPlainText())
+        else:
+            new_lines = []
+            block = first_block
+            while block.isValid() and len(new_lines) < new_count:
+                new_lines.append(block.text())
+                block = block.next()
+            patched_cells = self.input_parser.replace_lines(first, removed_count, new_lines)
+            # Values patched in place can be shown right away, structural changes wait for the rebuild
+            self.parsed_data_model.update_values(patched_cells)
+            self.column_stats_tracker.mark_cells(patched_cells)
+
+        self.parse_timer.start()
 
-        self.parsed_input_data = parsed_data
+    def parse_input_data(self):
+        """
+        Parses input data as a dictionary where each field name maps to a column of values.
+        Stores the result in self.parsed_input_data.
+        """
+        self.parse_timer.stop()
+        self.parsed_input_data = self.input_parser.fields()
         self.update_parsed_data_table()
 
     def update_parsed_data_table(self):
         """
-        Updates the tree view UI with the parsed input data.
+        Updates the tree view UI with the parsed input data and its statistics. Only the blocks of rows that
+        changed since the last update are recomputed.
         """
-        model = QStandardItemModel()
-        model.setHorizontalHeaderLabels(["Field Name", "Values"])
-        self.ui.parsed_input_tree_view.setModel(model)  # Attach model to the tree view
-
-        for field_name, values in self.parsed_input_data.items():
-            str_values = [str(value) for value in values]
-            field_item = QStandardItem(field_name)
-            values_item = QStandardItem(", ".join(str_values))
-
-            # Make items read-only
-            field_item.setFlags(field_item.flags() & ~Qt.ItemIsEditable)
-            values_item.setFlags(values_item.flags() & ~Qt.ItemIsEditable)
-
-            # Add tooltip for full text
-            values_item.setData(", ".join(str_values), Qt.ToolTipRole)
-
-            model.appendRow([field_item, values_item])
-
+        self.parsed_data_model.set_fields(self.parsed_input_data)
+        self.column_stats_model.set_stats(self.column_stats_tracker.update(self.parsed_input_data))
         self.update_enabled_analyses(len(self.parsed_input_data))
 
     def update_enabled_analyses(self, num_fields: int):
-        analysis_names, containers = zip(*self.analysis_containers.items())
-        analysis_widgets = [self.ui.analysis_selection_layout.itemAt(i).widget() for i in
-                            range(self.ui.analysis_selection_layout.count() - 1)]
-        for name, container, widget in zip(analysis_names, containers, analysis_widgets):
-            widget.setEnabled(num_fields == len(container.input_keys))
+        for name, container in self.analysis_containers.items():
+            self.analysis_widgets[name].setEnabled(num_fields == len(container.input_keys))
 
     def update_save_to_file_enabled(self, state: bool):
         for i in range(self.ui.save_to_file_layout.count()):
@@ -223,17 +627,50 @@ class MainWindow(QWidget):
             if widget:
                 widget.setVisible(state)
 
+    def closeEvent(self, event):
+        self.settings_store.close()
+        if self.result_writer is not None:
+            self.result_writer.close(wait=False)
+        if self.worker_pool is not None:
+            self.analysis_runner.cancel_all()
+            # Workers still around at exit are terminated with the process
+            self.worker_pool.shutdown(wait=False)
+        super().closeEvent(event)
+
     def load_settings(self):
-        for widget in self.findChildren((QLineEdit, QTextEdit)):
+        for widget in self.findChildren(QLineEdit):
             widget.setText(self.settings.value(widget.objectName(), ""))
             if widget.objectName() == "analysis_directory_line_edit":
                 self.populate_analyses()
         for checkbox in self.findChildren(QCheckBox):
             checkbox.setChecked(self.settings.value(checkbox.objectName(), False, type=bool))
+        for combo_box in self.findChildren(QComboBox):
+            index = combo_box.findText(self.settings.value(combo_box.objectName(), ""))
+            if index >= 0:
+                combo_box.setCurrentIndex(index)
+        # The input data snapshot can be large, so it is restored once the window is showing
+        QTimer.singleShot(0, self.restore_input_data)
+
+    def restore_input_data(self):
+        input_data_file = self.settings.value("input_data_file", "")
+        if input_data_file and os.path.isfile(input_data_file):
+            self.load_input_file(input_data_file)
+            return
+        key = self.ui.input_data_text_edit.objectName()
+        text = self.settings_store.load_snapshot(key)
+        if text is not None:
+            self.ui.input_data_text_edit.setPlainText(text)
+            self.settings_store.discard(key)
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    # Same names as the QSettings, so app data (caches, snapshots) lives in a stable per-app directory
+    app.setOrganizationName("MyCompany")
+    app.setApplicationName("MyApp")
     window = MainWindow()
+    log_startup("window constructed")
     window.show()
+    # Warm up from the event loop, after the window has been painted
+    QTimer.singleShot(0, window.start_warm_up)
     sys.exit(app.exec())
@@ -0,0 +1,174 @@
+from collections import deque
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtWidgets import QPlainTextEdit
+
+from analysis_result import AnalysisResult
+
+
+class ChunkedOutputRenderer(QObject):
+    # Emitted when output that load_more() can show appears or runs out
+    more_available = pyqtSignal(bool)
+
+    def __init__(self, text_edit: QPlainTextEdit, chunk_lines: int = 2000, collapsed_lines: int = 200,
+                 page_lines: int = 2000, max_characters: int = 1_000_000, page_characters: int = 250_000,
+                 parent=None):
+        """
+        Renders analysis output into a text edit a chunk at a time from the event loop, so large results don't
+        freeze the GUI. Sections are only formatted when their turn to render comes. Sections longer than
+        collapsed_lines show their first lines followed by a marker, and rendering stops once the text edit holds
+        max_characters. The hidden lines stay queued here; load_more() shows the next page of the first collapsed
+        section or, once none are left, continues past the cap.
+        :param text_edit: Text edit the output is appended to.
+        :param chunk_lines: Lines rendered per event loop iteration.
+        :param collapsed_lines: Lines shown of a section before it is collapsed.
+        :param page_lines: Lines of a collapsed section shown per load_more().
+        :param max_characters: Characters rendered before output is truncated.
+        :param page_characters: Characters rendered past the cap per load_more().
+        """
+        super().__init__(parent)
+        self.text_edit = text_edit
+        self.chunk_lines = chunk_lines
+        self.collapsed_lines = collapsed_lines
+        self.page_lines = page_lines
+        self.max_characters = max_characters
+        self.page_characters = page_characters
+
+        self._queue = deque()  # (callable returning lines, section name or None for lines never collapsed)
+        self._current = None  # [lines, next index, section name] of the entry being rendered
+        self._collapsed = deque()  # [lines, next index, section name, cursor at the marker] per collapsed section
+        self._truncation_cursor: QTextCursor = None  # At the marker ending truncated output
+        self._characters = 0
+        self._budget = max_characters
+        self._more_available = False
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.render_next_chunk)
+
+    def clear(self):
+        self._timer.stop()
+        self._queue.clear()
+        self._current = None
+        self._collapsed.clear()
+        self._truncation_cursor = None
+        self._characters = 0
+        self._budget = self.max_characters
+        self.text_edit.clear()
+        self._update_more_available()
+
+    def append_text(self, line: str):
+        self._queue.append((lambda: [line], None))
+        self._timer.start()
+
+    def append_result(self, result: AnalysisResult):
+        """
+        Queues every section of the result under a header line, as AnalysisResult.to_text lays them out.
+        """
+        for key in result:
+            self._queue.append((lambda key=key: [f"======== {key} ========"], None))
+            self._queue.append((lambda key=key: result.section_lines(key), key))
+        self._timer.start()
+
+    def render_next_chunk(self):
+        """
+        Renders up to chunk_lines more lines of the queued output.
+        """
+        text_lines = []
+        size = 0
+        while len(text_lines) < self.chunk_lines and self._characters + size < self._budget:
+            if self._current is None:
+                if not self._queue:
+                    break
+                get_lines, section = self._queue.popleft()
+                self._current = [get_lines(), 0, section]
+            lines, index, section = self._current
+
+            shown = len(lines)
+            if section is not None and shown > self.collapsed_lines:
+                shown = self.collapsed_lines
+            end = min(shown, index + self.chunk_lines - len(text_lines))
+            text_lines.extend(lines[index:end])
+            size += sum(len(line) + 1 for line in lines[index:end])
+            self._current[1] = end
+            if end == shown:
+                self._current = None
+                if shown < len(lines):
+                    self._insert(text_lines)
+                    text_lines, size = [], 0
+                    self._collapsed.append([lines, shown, section, self._insert_marker(len(lines) - shown, section)])
+        self._insert(text_lines)
+
+        if self._current is None and not self._queue:
+            self._timer.stop()
+        elif self._characters >= self._budget:
+            self._timer.stop()
+            if self._truncation_cursor is None:
+                self._truncation_cursor = self._insert_marker()
+        self._update_more_available()
+
+    def load_more(self):
+        """
+        Shows the next page of the first collapsed section or, with every section expanded, the next
+        page_characters of output past the cap.
+        """
+        if self._collapsed:
+            entry = self._collapsed[0]
+            lines, index, section, cursor = entry
+            end = min(len(lines), index + self.page_lines)
+            text = "\n".join(lines[index:end])
+            marker = self._marker(len(lines) - end, section) if end < len(lines) else None
+            if marker is not None:
+                text += "\n" + marker
+
+            # Replace the marker line in place; cursors of later markers move along with the inserted text
+            cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+            self._characters += len(text) - len(cursor.selectedText())
+            cursor.insertText(text)
+            if marker is None:
+                self._collapsed.popleft()
+            else:
+                entry[1] = end
+                cursor.setPosition(cursor.position() - len(marker))
+        elif self._truncation_cursor is not None:
+            self._truncation_cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+            self._truncation_cursor.removeSelectedText()
+            self._truncation_cursor = None
+            self._budget = self._characters + self.page_characters
+            self.render_next_chunk()
+            if self._current is not None or self._queue:
+                self._timer.start()
+        self._update_more_available()
+
+    def _insert(self, lines):
+        if not lines:
+            return
+        text = "\n".join(lines) + "\n"
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self._characters += len(text)
+
+    def _insert_marker(self, hidden_lines: int = None, section: str = None) -> QTextCursor:
+        """
+        Appends a marker line for hidden output.
+        :return: Cursor at the start of the marker.
+        """
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.movePosition(QTextCursor.End)
+        position = cursor.position()
+        self._insert([self._marker(hidden_lines, section)])
+        cursor.setPosition(position)
+        return cursor
+
+    def _marker(self, hidden_lines: int = None, section: str = None) -> str:
+        if section is None:
+            return f"[... output truncated at {self._characters:,} characters; Load More shows more ...]"
+        return f"[... {hidden_lines:,} more lines of {section}; Load More shows them ...]"
+
+    def _update_more_available(self):
+        more_available = bool(self._collapsed) or self._truncation_cursor is not None
+        if more_available != self._more_available:
+            self._more_available = more_available
+            self.more_available.emit(more_available)
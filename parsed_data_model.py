@@ -0,0 +1,183 @@
+import math
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from column_stats import QUANTILES, ColumnStats
+
+# Rows shown before the preview is evenly downsampled
+MAX_PREVIEW_ROWS = 10_000
+
+
+class ParsedDataModel(QAbstractTableModel):
+    """
+    Read-only table model over the parsed input columns, one column per field (after a leading row number column)
+    and one row per value. Values are read straight from the column buffers, so only the visible cells are ever
+    formatted. Fields longer than max_rows are shown as evenly spaced rows of the data, so the preview costs the
+    same however large the data is.
+    """
+
+    def __init__(self, parent=None, max_rows: int = MAX_PREVIEW_ROWS):
+        super().__init__(parent)
+        self.max_rows = max_rows
+        self._names: list[str] = []
+        self._columns: list = []
+        self._row_count = 0
+        self._source_row_count = 0
+        self._positions = None  # Data row shown in each preview row, when downsampled
+
+    @property
+    def downsampled(self) -> bool:
+        return self._positions is not None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or not self._columns else len(self._columns) + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        position = index.row() if self._positions is None else int(self._positions[index.row()])
+        if index.column() == 0:
+            return str(position + 1)
+        column = self._columns[index.column() - 1]
+        if position >= len(column):
+            return None  # Ragged field with fewer values than the longest one
+        return str(column[position])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            if section == 0:
+                return "Row" if self._positions is None else f"Row ({self._row_count:,} of {self._source_row_count:,})"
+            return self._names[section - 1] if section - 1 < len(self._names) else None
+        return str(section + 1)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def set_fields(self, fields: dict):
+        """
+        Points the model at new field columns, emitting only the column/row insertions, removals and
+        data changes needed to get from the old shape to the new one.
+        :param fields: Dictionary mapping each field name to its column of values.
+        """
+        names = list(fields)
+        columns = list(fields.values())
+        old_column_count = self.columnCount()
+        column_count = len(columns) + 1 if columns else 0
+        old_row_count = self._row_count
+
+        if column_count > old_column_count:
+            self.beginInsertColumns(QModelIndex(), old_column_count, column_count - 1)
+            self._names, self._columns = names, columns
+            self.endInsertColumns()
+        elif column_count < old_column_count:
+            self.beginRemoveColumns(QModelIndex(), column_count, old_column_count - 1)
+            self._names, self._columns = names, columns
+            self.endRemoveColumns()
+        else:
+            self._names, self._columns = names, columns
+
+        self._source_row_count = max((len(column) for column in columns), default=0)
+        if self._source_row_count > self.max_rows:
+            import numpy as np
+            self._positions = np.linspace(0, self._source_row_count - 1, self.max_rows).round().astype(np.int64)
+            row_count = self.max_rows
+        else:
+            self._positions = None
+            row_count = self._source_row_count
+
+        if row_count > old_row_count:
+            self.beginInsertRows(QModelIndex(), old_row_count, row_count - 1)
+            self._row_count = row_count
+            self.endInsertRows()
+        elif row_count < old_row_count:
+            self.beginRemoveRows(QModelIndex(), row_count, old_row_count - 1)
+            self._row_count = row_count
+            self.endRemoveRows()
+
+        # Cells that existed before and after may hold new values
+        changed_rows = min(old_row_count, row_count)
+        changed_columns = min(old_column_count, column_count)
+        if changed_rows and changed_columns:
+            self.dataChanged.emit(self.index(0, 0), self.index(changed_rows - 1, changed_columns - 1))
+        if columns:
+            self.headerDataChanged.emit(Qt.Horizontal, 0, column_count - 1)
+
+    def update_values(self, cells: list[tuple[int, int]]):
+        """
+        Notifies views about values patched in place in the column buffers.
+        :param cells: (column, row) of every changed value, columns counted in field order.
+        """
+        row_ranges = {}
+        for column, position in cells:
+            row = self._preview_row(position)
+            if row is None:
+                continue  # Not among the downsampled rows
+            first, last = row_ranges.get(column, (row, row))
+            row_ranges[column] = (min(first, row), max(last, row))
+        for column, (first, last) in row_ranges.items():
+            self.dataChanged.emit(self.index(first, column + 1), self.index(last, column + 1))
+
+    def _preview_row(self, position):
+        if self._positions is None:
+            return position
+        import numpy as np
+        row = int(np.searchsorted(self._positions, position))
+        return row if row < len(self._positions) and self._positions[row] == position else None
+
+
+class ColumnStatsModel(QAbstractTableModel):
+    """
+    Read-only table model of the summary statistics of each field, one row per field.
+    """
+    HEADERS = ["Field", "Count", "Missing", "Min", "Max", "Mean", "Std"] + \
+              ["Median" if q == 0.5 else f"{q:.0%}" for q in QUANTILES]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._names: list[str] = []
+        self._stats: list[ColumnStats] = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._stats)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        stats = self._stats[index.row()]
+        values = [self._names[index.row()], stats.count, stats.missing, stats.minimum, stats.maximum, stats.mean,
+                  stats.std] + [stats.quantile(q) for q in QUANTILES]
+        value = values[index.column()]
+        if isinstance(value, float):
+            return "" if math.isnan(value) else f"{value:.6g}"
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def set_stats(self, stats: dict[str, ColumnStats]):
+        """
+        :param stats: Dictionary mapping each field name to its statistics.
+        """
+        self.beginResetModel()
+        self._names = list(stats)
+        self._stats = list(stats.values())
+        self.endResetModel()
@@ -1,112 +1,1160 @@
+import hashlib
+import multiprocessing
 import os
+import queue
 import re
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import Future
 
-import pandas as pd
-import rpy2.robjects as robjects
+from analysis_result import AnalysisResult
+from result_cache import ResultCache
+from run_trace import RunTrace
+
+# R's integer NA is the smallest 32-bit integer
+_R_NA_INTEGER = -2 ** 31
+_R_INTEGER_MAX = 2 ** 31 - 1
+
+# Runs a batch of argument lists through a script in one R call: the script's own process_data_batch(shared, batch)
+# if it defines one, otherwise process_data once per input set. Failures of single input sets are returned as
+# run_many_error objects so the rest of the batch still completes.
+_RUN_MANY_R = """
+function(process_data, process_data_batch, shared, batch) {
+  if (!is.null(process_data_batch)) {
+    return(process_data_batch(shared, batch))
+  }
+  lapply(batch, function(args) {
+    tryCatch(do.call(process_data, c(shared, args)),
+             error = function(e) structure(conditionMessage(e), class = "run_many_error"))
+  })
+}
+"""
+_r_run_many = None
+
+# Session object store shared by every script in this R process. session_cache(name, expr, deps) returns the
+# value stored under the name for deps of the same content, evaluating expr (lazily, as a promise) only on a miss.
+# Entries are evicted least recently used first once their total size exceeds the limit.
+_SESSION_CACHE_R = """
+.cache <- new.env(hash = TRUE, parent = emptyenv())
+.cache_limit <- 256 * 1024^2
+.cache_bytes <- 0
+.cache_tick <- 0
+.cache_hits <- 0
+.cache_misses <- 0
+
+session_cache <- function(name, expr, deps = NULL) {
+  key <- paste0(name, ":", .session_cache_hash(serialize(deps, NULL)))
+  .cache_tick <<- .cache_tick + 1
+  entry <- .cache[[key]]
+  if (!is.null(entry)) {
+    .cache_hits <<- .cache_hits + 1
+    entry$last_used <- .cache_tick
+    assign(key, entry, envir = .cache)
+    return(entry$value)
+  }
+
+  .cache_misses <<- .cache_misses + 1
+  value <- expr
+  size <- as.numeric(object.size(value))
+  if (size <= .cache_limit) {
+    assign(key, list(value = value, size = size, last_used = .cache_tick), envir = .cache)
+    .cache_bytes <<- .cache_bytes + size
+    session_cache_evict(.cache_limit)
+  }
+  value
+}
+
+session_cache_evict <- function(limit) {
+  if (.cache_bytes <= limit) {
+    return(invisible(NULL))
+  }
+  keys <- ls(.cache, all.names = TRUE)
+  last_used <- vapply(keys, function(key) .cache[[key]]$last_used, numeric(1))
+  for (key in keys[order(last_used)]) {
+    if (.cache_bytes <= limit) break
+    .cache_bytes <<- .cache_bytes - .cache[[key]]$size
+    rm(list = key, envir = .cache)
+  }
+  invisible(NULL)
+}
+
+session_cache_set_limit <- function(bytes) {
+  .cache_limit <<- bytes
+  session_cache_evict(bytes)
+}
+
+session_cache_clear <- function() {
+  rm(list = ls(.cache, all.names = TRUE), envir = .cache)
+  .cache_bytes <<- 0
+}
+
+session_cache_stats <- function() {
+  c(entries = length(.cache), bytes = .cache_bytes, limit_bytes = .cache_limit,
+    hits = .cache_hits, misses = .cache_misses)
+}
+"""
+_r_tools_env = None
+
+# Sourcing a script into its environment with every function it defines byte-compiled, and saving/loading that
+# environment so later processes skip parsing, evaluating and compiling the script. The environment is saved with
+# globalenv as its parent (so the tools environment isn't serialized along with it) and reparented on load.
+# Packages the script attaches are recorded and attached again on load, since its library() calls don't rerun.
+_COMPILED_SCRIPT_R = """
+compile_script <- function(r_code, parent) {
+  attached_before <- search()
+  env <- new.env(parent = parent)
+  eval(parse(text = r_code), envir = env)
+  for (name in ls(env, all.names = TRUE)) {
+    value <- get(name, envir = env, inherits = FALSE)
+    if (is.function(value) && identical(environment(value), env)) {
+      assign(name, compiler::cmpfun(value), envir = env)
+    }
+  }
+  attached <- setdiff(search(), attached_before)
+  list(env = env, attached = sub("^package:", "", grep("^package:", attached, value = TRUE)))
+}
+
+save_compiled_script <- function(compiled, input_keys, path) {
+  env <- compiled$env
+  parent <- parent.env(env)
+  parent.env(env) <- globalenv()
+  on.exit(parent.env(env) <- parent)
+  temp_path <- paste0(path, ".", Sys.getpid(), ".tmp")
+  saveRDS(list(env = env, attached = compiled$attached, input_keys = input_keys), temp_path, compress = FALSE)
+  if (!file.rename(temp_path, path)) {
+    unlink(temp_path)
+  }
+  invisible(NULL)
+}
+
+load_compiled_script <- function(path, parent) {
+  compiled <- readRDS(path)
+  for (package in compiled$attached) {
+    library(package, character.only = TRUE)
+  }
+  parent.env(compiled$env) <- parent
+  compiled
+}
+"""
+_r_version = None
+
+# Runs that have used this process's R session, for MemoryLimits.recycle_after_runs
+_r_session_runs = 0
+
+# psutil is optional; without it RSS is read from /proc (see _process_rss_mb)
+_psutil = None
+
+# rpy2.robjects starts the embedded R interpreter when imported, so it is only imported on first use
+# (see initialize_r). NumPy and pandas are likewise imported inside the conversion functions.
+robjects = None
+
+
+def initialize_r():
+    """
+    Starts the embedded R interpreter, if it isn't running yet.
+    :return: The rpy2.robjects module.
+    """
+    global robjects
+    if robjects is None:
+        import rpy2.robjects
+        robjects = rpy2.robjects
+    return robjects
+
+
+def extract_function_arguments(r_code: str) -> list[str]:
+    """
+    Extracts the argument names of the process_data function from R source code.
+    :return: List of argument names.
+    """
+    match = re.search(r'process_data\s*<-\s*function\((.*?)\)', r_code)
+    if match:
+        args = match.group(1).split(',')
+        return [arg.strip() for arg in args]
+    else:
+        raise ValueError("Could not extract function arguments from R script.")
+
+
+class MemoryLimits:
+    def __init__(self, cleanup_above_mb: float = None, recycle_after_runs: int = None,
+                 recycle_above_mb: float = None):
+        """
+        Limits on the memory an R session may accumulate over many runs, checked after every run.
+        Embedded R can only be started once per process, so restarting the session only applies to pool workers.
+        :param cleanup_above_mb: Above this process RSS, objects left in R's global environment and the session
+                                 object store are removed, and R runs a full garbage collection.
+        :param recycle_after_runs: Pool workers are replaced by a fresh process after this many runs.
+        :param recycle_above_mb: Pool workers are replaced when their RSS stays above this after cleanup.
+        """
+        self.cleanup_above_mb = cleanup_above_mb
+        self.recycle_after_runs = recycle_after_runs
+        self.recycle_above_mb = recycle_above_mb
+
+    def should_recycle(self, runs: int, rss_mb: float) -> bool:
+        if self.recycle_after_runs and runs >= self.recycle_after_runs:
+            return True
+        return bool(self.recycle_above_mb and rss_mb is not None and rss_mb > self.recycle_above_mb)
 
 
 class RAnalysisContainer:
-    def __init__(self, r_script_path):
+    def __init__(self, r_script_path, input_keys: list[str] = None):
         """
         Initializes the container with the path to the R script and extracts input argument names.
         :param r_script_path: Path to the R script to be executed.
+        :param input_keys: Argument names already known for the script (e.g. from a ScriptRegistry),
+                           skipping reading the script here.
         """
         if not os.path.exists(r_script_path):
             raise FileNotFoundError(f"R script not found: {r_script_path}")
 
         self.r_script_path = os.path.normpath(r_script_path)
-        self.input_keys = self._extract_function_arguments()
+        self.input_keys = list(input_keys) if input_keys is not None else self._extract_function_arguments()
         self.name = "NO_NAME"
 
+        # Optional memoization of results by script hash and input fingerprint
+        self.result_cache: ResultCache = None
+
+        # Optional directory of byte-compiled scripts, shared across processes and launches (see _load_script)
+        self.compiled_script_directory: str = None
+
+        # Sample R heap usage after every run. Off by default, since it forces a full R garbage collection
+        self.trace_r_memory = False
+        # Optional cleanup of the R session when runs leave the process using too much memory
+        self.memory_limits: MemoryLimits = None
+        self.last_trace: RunTrace = None
+
+        # Script state cached between runs (see _load_script)
+        self.script_hash = None
+        self._script_stamp = None
+        self._r_env = None
+        self._r_func = None
+        self._r_batch_func = None
+
     def run(self, **inputs):
         """
         Runs the R script with the given input data.
-        :param inputs: Keyword arguments matching the expected input keys.
-        :return: Cleaned results dictionary.
+        :param inputs: Keyword arguments matching the expected input keys. They are checked once the script is
+                       (re)loaded, so edits to the process_data signature take effect on the next run.
+        :return: Typed results, keyed by upper-case section name.
         """
+        trace = RunTrace(os.path.basename(self.r_script_path))
+        self.last_trace = trace
 
-        if set(inputs.keys()) != set(self.input_keys):
-            raise ValueError(f"Expected inputs: {self.input_keys}, but got: {list(inputs.keys())}")
+        cache_key = None
+        if self.result_cache is not None:
+            with trace.span("cache_lookup"):
+                cache_key = self.result_cache.key_for(self.r_script_path, inputs)
+                cached_result = self.result_cache.get(cache_key)
+            if cached_result is not None:
+                trace.counters["cache_hit"] = True
+                return cached_result.with_trace(trace)
+
+        # Cache hits never start R; from here on every stage also records R's GC time
+        rss_before = _process_rss_mb()
+        with trace.span("initialize_r"):
+            initialize_r()
+        trace.gc_timer = _r_gc_seconds
+
+        raw_result = self._run_r_script(inputs, trace)
+        with trace.span("clean_output"):
+            result = self._clean_output(raw_result)
+        if self.trace_r_memory:
+            trace.counters.update(_r_memory_counters())
+        trace.counters.update(_session_cache_counters())
+        self._account_memory(trace, rss_before)
+
+        if cache_key is not None:
+            self.result_cache.put(cache_key, result)
+        return result.with_trace(trace)
+
+    def run_many(self, input_sets: list[dict], shared_inputs: dict = None) -> list:
+        """
+        Runs the R script over a batch of input sets (e.g. a parameter sweep) in a single R call.
+        Shared inputs are converted to R once for the whole batch. If the script defines
+        process_data_batch(shared, batch), it receives the shared inputs as a named list and the input sets as a
+        list of named lists, and can vectorize the work; otherwise process_data is called once per input set.
+        :param input_sets: Keyword arguments that vary between runs.
+        :param shared_inputs: Keyword arguments common to every run.
+        :return: Typed results, one per input set and in the same order.
+        """
+        shared_inputs = shared_inputs or {}
+        trace = RunTrace(os.path.basename(self.r_script_path))
+        trace.counters["batch_size"] = len(input_sets)
+        self.last_trace = trace
+
+        results = [None] * len(input_sets)
+        cache_keys = [None] * len(input_sets)
+        if self.result_cache is not None:
+            with trace.span("cache_lookup"):
+                for i, inputs in enumerate(input_sets):
+                    cache_keys[i] = self.result_cache.key_for(self.r_script_path, {**shared_inputs, **inputs})
+                    results[i] = self.result_cache.get(cache_keys[i])
+            trace.counters["cache_hits"] = sum(result is not None for result in results)
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            rss_before = _process_rss_mb()
+            with trace.span("initialize_r"):
+                initialize_r()
+            trace.gc_timer = _r_gc_seconds
+
+            raw_results = self._run_r_batch([input_sets[i] for i in pending], shared_inputs, trace)
+            with trace.span("clean_output"):
+                for i, raw_result in zip(pending, raw_results):
+                    results[i] = self._clean_output(raw_result)
+            if self.trace_r_memory:
+                trace.counters.update(_r_memory_counters())
+            trace.counters.update(_session_cache_counters())
+            self._account_memory(trace, rss_before)
+            for i in pending:
+                if cache_keys[i] is not None:
+                    self.result_cache.put(cache_keys[i], results[i])
+
+        return [result.with_trace(trace) for result in results]
 
-        result = self._run_r_script(inputs)
-        return self._clean_output(result)
+    @staticmethod
+    def session_cache_stats() -> dict:
+        """
+        The session object store is shared by every script run in this R process (each pool worker has its own).
+        Scripts opt in by wrapping expensive intermediates in session_cache(name, expr, deps), which evaluates
+        expr only if nothing is stored under the name for deps with the same content.
+        :return: Number of stored objects, their total size and size limit in bytes, and hit and miss counts.
+        """
+        stats = _tools_env()["session_cache_stats"]()
+        return dict(zip(stats.names, stats))
+
+    @staticmethod
+    def set_session_cache_limit(megabytes: float):
+        """
+        Bounds the total size of the session object store, evicting the least recently used objects over it.
+        A limit of 0 disables storing.
+        """
+        _tools_env()["session_cache_set_limit"](megabytes * 1024 ** 2)
 
-    def _run_r_script(self, inputs):
+    @staticmethod
+    def clear_session_cache():
+        _tools_env()["session_cache_clear"]()
+
+    @staticmethod
+    def clean_r_session():
+        """
+        Removes everything scripts left in R's global environment, empties the session object store and runs
+        a full garbage collection. Script environments and their compiled functions are kept.
+        """
+        initialize_r()
+        robjects.r("rm(list = ls(globalenv(), all.names = TRUE), envir = globalenv())")
+        RAnalysisContainer.clear_session_cache()
+        robjects.r["gc"](verbose=False, full=True)
+
+    def _account_memory(self, trace: RunTrace, rss_before: float):
+        """
+        Records the process RSS after a run and the runs this R session has served, and cleans up the
+        session if the run left it above the memory limit.
+        """
+        global _r_session_runs
+        _r_session_runs += 1
+        rss = _process_rss_mb()
+        trace.counters["r_session_runs"] = _r_session_runs
+        if rss is None:
+            return
+        trace.counters["rss_mb"] = round(rss, 1)
+        if rss_before is not None:
+            trace.counters["rss_delta_mb"] = round(rss - rss_before, 1)
+
+        limits = self.memory_limits
+        if limits is not None and limits.cleanup_above_mb and rss > limits.cleanup_above_mb:
+            with trace.span("clean_r_session"):
+                self.clean_r_session()
+            trace.counters["rss_after_cleanup_mb"] = round(_process_rss_mb(), 1)
+
+    def _load_script(self, trace: RunTrace = None):
+        """
+        Sources the R script into its own R environment and returns the process_data function.
+        The script is only re-read when its mtime/size changes, and only re-evaluated when its content hash changes.
+        Functions defined by the script are byte-compiled. With a compiled_script_directory, the compiled
+        environment and input keys are saved there, keyed by content hash and R version, and later loads in any
+        process read them back instead of sourcing the script.
+        :param trace: Trace recording the read and source stages, if any.
+        :return: The process_data R function defined by the script.
+        """
+        initialize_r()
+        trace = trace or RunTrace(os.path.basename(self.r_script_path))
         try:
-            with open(self.r_script_path, "r") as file:
-                r_code = file.read()
+            stat = os.stat(self.r_script_path)
+            script_stamp = (stat.st_mtime_ns, stat.st_size)
+            if self._r_func is not None and script_stamp == self._script_stamp:
+                return self._r_func
+
+            with trace.span("read_script"):
+                with open(self.r_script_path, "r") as file:
+                    r_code = file.read()
         except Exception as e:
             raise RuntimeError(f"Error reading R script: {e}")
 
+        script_hash = hashlib.sha256(r_code.encode("utf-8")).hexdigest()
+        if self._r_func is not None and script_hash == self.script_hash:
+            # File was touched but its content is unchanged
+            self._script_stamp = script_stamp
+            return self._r_func
+
+        compiled_path = self._compiled_script_path(script_hash)
+        compiled = None
+        if compiled_path is not None and os.path.exists(compiled_path):
+            try:
+                with trace.span("load_compiled_script"):
+                    compiled = _tools_env()["load_compiled_script"](compiled_path, _tools_env())
+                input_keys = [str(key) for key in compiled.rx2("input_keys")]
+                trace.counters["compiled_script_hit"] = True
+            except Exception as e:
+                print("Ignoring unreadable compiled script", compiled_path, ":", e)
+                compiled = None
+
+        if compiled is None:
+            input_keys = self._extract_function_arguments(r_code)
         try:
-            # Load R script
-            robjects.r(r_code)
+            if compiled is None:
+                # Source the script into a fresh environment so scripts can't overwrite each other's definitions.
+                # Its parent holds the session object store shared by all scripts.
+                with trace.span("source_script"):
+                    compiled = _tools_env()["compile_script"](r_code, _tools_env())
+                if compiled_path is not None:
+                    with trace.span("save_compiled_script"):
+                        self._save_compiled_script(compiled, input_keys, compiled_path)
+            r_env = compiled.rx2("env")
 
-            # Extract function name dynamically
             function_name = "process_data"  # Assuming the function is named process_data
-            r_func = robjects.globalenv[function_name]
+            r_func = r_env.find(function_name)
+            # Optional vectorized entry point for run_many
+            has_batch_func = robjects.r["exists"]("process_data_batch", envir=r_env, inherits=False)[0]
+            r_batch_func = r_env.find("process_data_batch") if has_batch_func else None
+        except Exception as e:
+            raise RuntimeError(f"Error loading R script: {e}")
+
+        self.input_keys = input_keys
+        self.script_hash = script_hash
+        self._script_stamp = script_stamp
+        self._r_env = r_env
+        self._r_func = r_func
+        self._r_batch_func = r_batch_func
+        return r_func
 
+    def _run_r_script(self, inputs, trace: RunTrace = None):
+        trace = trace or RunTrace(os.path.basename(self.r_script_path))
+        r_func = self._load_script(trace)
+        if set(inputs.keys()) != set(self.input_keys):
+            raise ValueError(f"Expected inputs: {self.input_keys}, but got: {list(inputs.keys())}")
+
+        try:
             # Convert inputs into R-compatible formats
-            r_inputs = [self._convert_to_r_type(inputs[key]) for key in self.input_keys]
+            with trace.span("convert_inputs"):
+                r_inputs = [self._convert_to_r_type(inputs[key]) for key in self.input_keys]
 
             # Call R function
-            result = r_func(*r_inputs)
+            with trace.span("call_process_data"):
+                result = r_func(*r_inputs)
+
+            # Convert result to a dictionary of typed values
+            with trace.span("convert_output"):
+                return _result_to_dict(result)
+        except Exception as e:
+            raise RuntimeError(f"Error executing R function: {e}")
+
+    def _run_r_batch(self, input_sets, shared_inputs, trace: RunTrace):
+        global _r_run_many
+        r_func = self._load_script(trace)
+        for inputs in input_sets:
+            if set(inputs) | set(shared_inputs) != set(self.input_keys) or set(inputs) & set(shared_inputs):
+                raise ValueError(f"Expected inputs: {self.input_keys}, but got: "
+                                 f"{list(shared_inputs)} shared and {list(inputs)} per run")
+        if _r_run_many is None:
+            _r_run_many = robjects.r(_RUN_MANY_R)
 
-            # Handle NULLType result
-            if not hasattr(result, 'names') or result.names is None:
-                raise ValueError(
-                    "R function did not return a named list. Ensure the function returns a list with named elements.")
+        try:
+            with trace.span("convert_inputs"):
+                r_shared = robjects.ListVector(
+                    [(key, self._convert_to_r_type(value)) for key, value in shared_inputs.items()])
+                r_batch = robjects.r["list"](*(
+                    robjects.ListVector([(key, self._convert_to_r_type(value)) for key, value in inputs.items()])
+                    for inputs in input_sets))
 
-            # Convert result to dictionary
-            return {name: str(result[i]) for i, name in enumerate(result.names)}
+            with trace.span("call_process_data", batch_size=len(input_sets),
+                            vectorized=self._r_batch_func is not None):
+                r_results = _r_run_many(r_func, self._r_batch_func or robjects.NULL, r_shared, r_batch)
+            if len(r_results) != len(input_sets):
+                raise ValueError(f"process_data_batch returned {len(r_results)} results for {len(input_sets)} "
+                                 f"input sets")
         except Exception as e:
             raise RuntimeError(f"Error executing R function: {e}")
 
+        results = []
+        with trace.span("convert_output"):
+            for i, r_result in enumerate(r_results):
+                if robjects.r["inherits"](r_result, "run_many_error")[0]:
+                    raise RuntimeError(f"Error executing R function for input set {i}: {r_result[0]}")
+                try:
+                    results.append(_result_to_dict(r_result))
+                except Exception as e:
+                    raise RuntimeError(f"Error executing R function for input set {i}: {e}")
+        return results
+
     def _convert_to_r_type(self, value):
         """
-        Converts Python data types into R-compatible types.
+        Converts Python, NumPy and pandas data into R-compatible types.
+        Numeric, integer and logical data is handed to R as one contiguous buffer instead of element by element.
+        Pandas categoricals become factors and DataFrames become data.frames.
         """
-        if isinstance(value, list) and all(isinstance(v, (int, float)) for v in value):
-            return robjects.FloatVector(value)
-        elif isinstance(value, list) and all(isinstance(v, str) for v in value):
-            return robjects.StrVector(value)
-        elif isinstance(value, str):
+        import numpy as np
+        import pandas as pd
+
+        initialize_r()
+        if isinstance(value, str):
             return robjects.StrVector([value])
+        elif isinstance(value, pd.DataFrame):
+            return robjects.DataFrame({str(name): self._convert_to_r_type(column) for name, column in value.items()})
+        elif isinstance(value, pd.Categorical):
+            return _categorical_to_r(value)
+        elif isinstance(value, pd.Series):
+            return _series_to_r(value)
+        elif isinstance(value, np.ndarray):
+            return _array_to_r(value)
+        elif isinstance(value, array):
+            return _array_to_r(np.frombuffer(value, dtype=value.typecode))
+        elif isinstance(value, (list, tuple)):
+            values = np.asarray(value)
+            if values.dtype.kind in "US" and not all(isinstance(v, str) for v in value):
+                raise TypeError("Unsupported input type: list with mixed value types")
+            return _array_to_r(values)
         else:
             raise TypeError(f"Unsupported input type: {type(value)}")
 
-    def _extract_function_arguments(self):
+    def _extract_function_arguments(self, r_code=None):
         """
         Extracts function argument names from the R script.
+        :param r_code: Script source, read from disk if not given.
         :return: List of argument names.
         """
-        with open(self.r_script_path, "r") as file:
-            r_code = file.read()
+        if r_code is None:
+            with open(self.r_script_path, "r") as file:
+                r_code = file.read()
+        return extract_function_arguments(r_code)
 
-        match = re.search(r'process_data\s*<-\s*function\((.*?)\)', r_code)
-        if match:
-            args = match.group(1).split(',')
-            return [arg.strip() for arg in args]
-        else:
-            raise ValueError("Could not extract function arguments from R script.")
+    def _compiled_script_path(self, script_hash):
+        """
+        :return: Path of the compiled form of the script content for the running R version, or None without
+                 a compiled_script_directory.
+        """
+        if not self.compiled_script_directory:
+            return None
+        key = hashlib.sha256(f"{script_hash}:{_r_version_string()}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.compiled_script_directory, f"{key}.rds")
+
+    def _save_compiled_script(self, compiled, input_keys, compiled_path):
+        try:
+            os.makedirs(self.compiled_script_directory, exist_ok=True)
+            _tools_env()["save_compiled_script"](compiled, robjects.StrVector(input_keys), compiled_path)
+        except Exception as e:
+            # Only costs the next process a compile
+            print("Could not save compiled script", compiled_path, ":", e)
 
     def _clean_output(self, result_dict):
         """
-        Cleans and formats the output from the R script.
-        :param result_dict: Dictionary of raw R script results.
-        :return: Dictionary with cleaned and formatted values.
+        Wraps the output from the R script in a result object that formats it lazily.
+        :param result_dict: Dictionary of typed R script results.
+        :return: AnalysisResult keyed by upper-case section name.
+        """
+        return AnalysisResult(result_dict)
+
+
+def _tools_env():
+    """
+    :return: The R environment holding the session object store, created on first use. Script environments
+             are its children, so every script can call session_cache.
+    """
+    global _r_tools_env
+    if _r_tools_env is None:
+        initialize_r()
+        import rpy2.rinterface as rinterface
+
+        @rinterface.rternalize
+        def session_cache_hash(serialized):
+            # Content hash of the serialized deps, computed from R's raw buffer without copying it
+            digest = hashlib.blake2b(serialized.memoryview(), digest_size=16).hexdigest()
+            return rinterface.StrSexpVector([digest])
+
+        tools_env = robjects.r["new.env"](parent=robjects.globalenv)
+        tools_env[".session_cache_hash"] = session_cache_hash
+        robjects.r["eval"](robjects.r["parse"](text=_SESSION_CACHE_R), envir=tools_env)
+        robjects.r["eval"](robjects.r["parse"](text=_COMPILED_SCRIPT_R), envir=tools_env)
+        _r_tools_env = tools_env
+    return _r_tools_env
+
+
+def _r_version_string() -> str:
+    """
+    :return: R's version string. Byte code is only reused by the R version that compiled it.
+    """
+    global _r_version
+    if _r_version is None:
+        _r_version = str(initialize_r().r["R.version.string"][0])
+    return _r_version
+
+
+def _session_cache_counters() -> dict:
+    """
+    :return: Size and hit counts of the session object store, in the form recorded in run traces.
+    """
+    stats = RAnalysisContainer.session_cache_stats()
+    return {
+        "r_session_cache_entries": int(stats["entries"]),
+        "r_session_cache_mb": round(stats["bytes"] / 1024 ** 2, 3),
+        "r_session_cache_hits": int(stats["hits"]),
+    }
+
+
+def _result_to_dict(result) -> dict:
+    """
+    Converts the named list returned by process_data into a dictionary of typed values.
+    """
+    # Handle NULLType result
+    if not hasattr(result, 'names') or result.names is None:
+        raise ValueError(
+            "R function did not return a named list. Ensure the function returns a list with named elements.")
+    return {name: _r_to_python(result[i]) for i, name in enumerate(result.names)}
+
+
+def _r_gc_seconds() -> float:
+    """
+    :return: Elapsed time R has spent in garbage collection so far.
+    """
+    return robjects.r["gc.time"]()[2]
+
+
+def _process_rss_mb() -> float:
+    """
+    :return: Resident set size of this process in megabytes, from psutil if it is installed and /proc otherwise,
+             or None where neither is available.
+    """
+    global _psutil
+    if _psutil is None:
+        try:
+            import psutil
+            _psutil = psutil
+        except ImportError:
+            _psutil = False
+    if _psutil:
+        return _psutil.Process().memory_info().rss / 1024 ** 2
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _r_memory_counters() -> dict:
+    """
+    Runs a full R garbage collection and reports the heap it leaves in use.
+    :return: Megabytes of R cons cells and vector heap in use, and the most used since the last reset.
+    """
+    # gc() returns a 2-row matrix (Ncells, Vcells) stored column by column; columns 2 and 6 are in Mb
+    usage = list(robjects.r["gc"](verbose=False))
+    return {
+        "r_ncells_mb": usage[2],
+        "r_vcells_mb": usage[3],
+        "r_max_used_mb": usage[10] + usage[11],
+    }
+
+
+def _array_to_r(values):
+    """
+    Converts a NumPy array to an R vector, or a matrix/array when it has more than one dimension.
+    Numeric buffers are copied into R in one block through the buffer protocol.
+    """
+    import numpy as np
+
+    flat = values.ravel(order="F")
+    kind = flat.dtype.kind
+    if kind == "f":
+        r_vector = robjects.FloatVector(np.ascontiguousarray(flat, dtype=np.float64))
+    elif kind in "iu":
+        if flat.size and (flat.min() < _R_NA_INTEGER + 1 or flat.max() > _R_INTEGER_MAX):
+            # Too large for an R integer
+            r_vector = robjects.FloatVector(np.ascontiguousarray(flat, dtype=np.float64))
+        else:
+            r_vector = robjects.IntVector(np.ascontiguousarray(flat, dtype=np.int32))
+    elif kind == "b":
+        r_vector = robjects.r["as.logical"](robjects.IntVector(np.ascontiguousarray(flat, dtype=np.int32)))
+    elif kind in "US":
+        r_vector = robjects.StrVector(flat.astype(str).tolist())
+    elif kind == "O" and all(isinstance(v, str) or v is None for v in flat):
+        r_vector = robjects.StrVector([robjects.NA_Character if v is None else v for v in flat])
+    else:
+        raise TypeError(f"Unsupported input dtype: {values.dtype}")
+
+    if values.ndim > 1:
+        r_vector = robjects.r["dim<-"](r_vector, robjects.IntVector(values.shape))
+    return r_vector
+
+
+def _series_to_r(series):
+    """
+    Converts a pandas Series, including nullable integer/boolean and categorical dtypes, to an R vector.
+    """
+    import numpy as np
+    import pandas as pd
+
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _categorical_to_r(series.array)
+    elif isinstance(dtype, pd.BooleanDtype):
+        codes = series.to_numpy(dtype=np.int32, na_value=_R_NA_INTEGER)
+        return robjects.r["as.logical"](robjects.IntVector(codes))
+    elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dtype):
+        return robjects.IntVector(series.to_numpy(dtype=np.int32, na_value=_R_NA_INTEGER))
+    elif pd.api.types.is_float_dtype(dtype):
+        return _array_to_r(series.to_numpy(dtype=np.float64, na_value=np.nan))
+    elif pd.api.types.is_string_dtype(dtype) or dtype == object:
+        return _array_to_r(series.astype(object).where(series.notna(), None).to_numpy())
+    return _array_to_r(series.to_numpy())
+
+
+def _categorical_to_r(categorical):
+    """
+    Converts a pandas Categorical to an R factor, reusing its integer codes.
+    """
+    import numpy as np
+
+    codes = categorical.codes.astype(np.int32) + 1
+    codes[codes == 0] = _R_NA_INTEGER  # Missing values have code -1
+    r_factor = robjects.IntVector(codes)
+    r_factor = robjects.r["levels<-"](r_factor, robjects.StrVector([str(c) for c in categorical.categories]))
+    r_class = ["ordered", "factor"] if categorical.ordered else ["factor"]
+    return robjects.r["class<-"](r_factor, robjects.StrVector(r_class))
+
+
+def _r_to_python(r_object):
+    """
+    Converts an R object returned by process_data into a typed Python value: numeric vectors become NumPy
+    arrays (DataFrames or Series when they carry dimnames or names), data.frames become DataFrames,
+    factors become Categoricals, named lists become dictionaries and character vectors stay strings.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(r_object, robjects.DataFrame):
+        columns = {name: _r_to_python(column) for name, column in zip(r_object.names, r_object)}
+        return pd.DataFrame(columns, index=list(r_object.rownames))
+    elif isinstance(r_object, robjects.FactorVector):
+        codes = np.array(r_object, dtype=np.int32)
+        codes[codes == _R_NA_INTEGER] = 0  # Missing values map to code -1
+        return pd.Categorical.from_codes(codes - 1, categories=list(r_object.levels))
+    elif isinstance(r_object, robjects.ListVector):
+        values = [_r_to_python(item) for item in r_object]
+        if r_object.names is robjects.NULL:
+            return values
+        return dict(zip(r_object.names, values))
+    elif isinstance(r_object, robjects.StrVector):
+        strings = [None if value is robjects.NA_Character else value for value in r_object]
+        return strings[0] if len(strings) == 1 else strings
+    elif isinstance(r_object, (robjects.FloatVector, robjects.IntVector, robjects.BoolVector)):
+        values = np.array(r_object)
+        if not isinstance(r_object, robjects.FloatVector) and (values == _R_NA_INTEGER).any():
+            values = np.where(values == _R_NA_INTEGER, np.nan, values)
+        elif isinstance(r_object, robjects.BoolVector):
+            values = values.astype(bool)
+
+        dim = robjects.r["dim"](r_object)
+        if dim is robjects.NULL:
+            if r_object.names is robjects.NULL:
+                return values
+            return pd.Series(values, index=list(r_object.names))
+
+        values = values.reshape(tuple(dim), order="F")
+        dimnames = robjects.r["dimnames"](r_object)
+        if len(dim) != 2 or dimnames is robjects.NULL:
+            return values
+        row_names, column_names = (None if names is robjects.NULL else list(names) for names in dimnames)
+        return pd.DataFrame(values, index=row_names, columns=column_names)
+    elif r_object is robjects.NULL:
+        return None
+    # Anything else (formulas, model objects, ...) is kept as R's printed form
+    return str(r_object)
+
+
+def _worker_main(analysis_directory, connection, compiled_script_directory=None, memory_limits: MemoryLimits = None,
+                 trace_r_memory: bool = False):
+    """
+    Entry point of an R worker process. Starts R and preloads every script in the analysis directory
+    (from their compiled forms in compiled_script_directory, where present),
+    reports ("ready", seconds spent) and then serves ("run", script path, inputs) and
+    ("run_many", script path, (input sets, shared inputs)) requests from the connection until it receives None.
+    Each reply is (status, result or error message, memory), where memory holds the worker's pid, runs served,
+    RSS and whether memory_limits ask for the worker to be replaced.
+    """
+    start = time.perf_counter()
+    initialize_r()
+    containers = {}
+    if analysis_directory and os.path.isdir(analysis_directory):
+        for r_file in os.listdir(analysis_directory):
+            if not r_file.endswith(".R"):
+                continue
+            r_file_path = os.path.normpath(os.path.join(analysis_directory, r_file))
+            try:
+                container = RAnalysisContainer(r_file_path)
+                container.compiled_script_directory = compiled_script_directory
+                container.memory_limits = memory_limits
+                container.trace_r_memory = trace_r_memory
+                container._load_script()
+            except Exception as e:
+                print("Worker could not preload", r_file_path, ":", e, file=sys.stderr)
+                continue
+            containers[r_file_path] = container
+    connection.send(("ready", time.perf_counter() - start))
+
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        method, r_script_path, args = task
+        try:
+            container = containers.get(r_script_path)
+            if container is None:
+                container = containers[r_script_path] = RAnalysisContainer(r_script_path)
+                container.compiled_script_directory = compiled_script_directory
+                container.memory_limits = memory_limits
+                container.trace_r_memory = trace_r_memory
+            if method == "run_many":
+                status, payload = "ok", container.run_many(*args)
+            else:
+                status, payload = "ok", container.run(**args)
+        except Exception as e:
+            status, payload = "error", str(e)
+
+        rss = _process_rss_mb()
+        memory = {"pid": os.getpid(), "runs": _r_session_runs, "rss_mb": None if rss is None else round(rss, 1),
+                  "recycle": memory_limits is not None and memory_limits.should_recycle(_r_session_runs, rss)}
+        connection.send((status, payload, memory))
+
+
+class _RWorkerProcess:
+    def __init__(self, context, analysis_directory, compiled_script_directory=None, memory_limits=None,
+                 trace_r_memory=False):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_main,
+                                       args=(analysis_directory, child_connection, compiled_script_directory,
+                                             memory_limits, trace_r_memory),
+                                       daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def wait_ready(self) -> float:
+        """
+        Blocks until the worker has started R and preloaded its scripts.
+        :return: Seconds the worker spent warming up.
         """
-        cleaned_results = {}
+        _, seconds = self.connection.recv()
+        return seconds
 
-        for key, value in result_dict.items():
-            clean_value = value.replace('[1]', '').replace("\\n", "\n")
-            clean_value = clean_value.split("\n")
-            cleaned_results[key.upper()] = clean_value
+    def request_stop(self):
+        """
+        Asks the worker to exit once it has finished warming up or its current run.
+        """
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
 
-        return cleaned_results
+    def stop(self, timeout: float = 1):
+        self.request_stop()
+        self.join(timeout)
+
+    def join(self, timeout: float):
+        """
+        Waits up to timeout seconds for the worker to exit, then kills it.
+        """
+        self.process.join(timeout=max(0.0, timeout))
+        if self.process.is_alive():
+            self.process.kill()
+        self.connection.close()
+
+
+class RWorkerPool:
+    def __init__(self, analysis_directory, num_workers=None, result_cache: ResultCache = None,
+                 compiled_script_directory: str = None, memory_limits: MemoryLimits = None,
+                 trace_r_memory: bool = False):
+        """
+        Pool of long-lived R worker processes. Embedded R is single-threaded and process-global,
+        so running analyses in parallel needs one interpreter per process.
+        Workers are started in the background, so creating a pool returns immediately; runs submitted before
+        a worker has warmed up wait in the queue.
+        :param analysis_directory: Directory whose .R scripts each worker preloads.
+        :param num_workers: Number of worker processes, defaults to the number of CPUs.
+        :param result_cache: Cache checked before dispatching a run, so hits never reach a worker.
+        :param compiled_script_directory: Directory of byte-compiled scripts that workers load instead of
+                                          sourcing the scripts, and save newly compiled ones to.
+        :param memory_limits: Limits on each worker's memory. Workers over them are replaced after their run.
+        :param trace_r_memory: Whether run traces record the R heap, at the cost of a full R GC after every run.
+        """
+        self.analysis_directory = analysis_directory
+        self.compiled_script_directory = compiled_script_directory
+        self.memory_limits = memory_limits
+        self.trace_r_memory = trace_r_memory
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.result_cache = result_cache
+
+        # Set once every worker has started R and preloaded its scripts (or failed to)
+        self.ready = threading.Event()
+        self.warm_up_seconds: list[float] = []  # Per started worker, None if it died while starting
+        self._ready_at = None
+        self._created_at = time.perf_counter()
+
+        # Spawn rather than fork, since the parent may be running Qt and other threads
+        self._context = multiprocessing.get_context("spawn")
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._running = {}  # Future -> worker slot
+        self._cancelled = set()
+        self._shut_down = False
+
+        # Memory reported by each worker after its last run, and how many workers were replaced for memory limits
+        self._worker_memory: list[dict] = [None] * self.num_workers
+        self.recycled_workers = 0
+
+        # Each dispatcher thread starts its own worker process, then feeds it tasks
+        self._workers: list[_RWorkerProcess] = [None] * self.num_workers
+        self._dispatchers = [threading.Thread(target=self._dispatch, args=(slot,), daemon=True)
+                             for slot in range(self.num_workers)]
+        for dispatcher in self._dispatchers:
+            dispatcher.start()
+
+    def submit(self, r_script_path, inputs) -> Future:
+        """
+        Queues a run of the given script; the next idle worker picks it up.
+        :param r_script_path: Path to the R script to run.
+        :param inputs: Keyword arguments matching the script's input keys.
+        :return: Future resolving to the typed results.
+        """
+        future = Future()
+        r_script_path = os.path.normpath(r_script_path)
+
+        cache_key = None
+        if self.result_cache is not None:
+            trace = RunTrace(os.path.basename(r_script_path))
+            with trace.span("cache_lookup"):
+                cache_key = self.result_cache.key_for(r_script_path, inputs)
+                cached_result = self.result_cache.get(cache_key)
+            if cached_result is not None:
+                trace.counters["cache_hit"] = True
+                future.set_result(cached_result.with_trace(trace))
+                return future
+
+        def finish(result):
+            if cache_key is not None:
+                # Cached without the trace of this run, as RAnalysisContainer.run does
+                self.result_cache.put(cache_key, result.with_trace(None))
+            return result
+
+        self._tasks.put((future, ("run", r_script_path, inputs), finish))
+        return future
+
+    def submit_many(self, r_script_path, input_sets: list[dict], shared_inputs: dict = None) -> Future:
+        """
+        Queues a batch of runs of the given script, executed by one worker in a single R call
+        (see RAnalysisContainer.run_many). Only input sets missing from the result cache are sent to the worker.
+        :return: Future resolving to the list of results, one per input set.
+        """
+        future = Future()
+        r_script_path = os.path.normpath(r_script_path)
+        shared_inputs = shared_inputs or {}
+
+        results = [None] * len(input_sets)
+        cache_keys = [None] * len(input_sets)
+        if self.result_cache is not None:
+            trace = RunTrace(os.path.basename(r_script_path))
+            trace.counters["batch_size"] = len(input_sets)
+            with trace.span("cache_lookup"):
+                for i, inputs in enumerate(input_sets):
+                    cache_keys[i] = self.result_cache.key_for(r_script_path, {**shared_inputs, **inputs})
+                    results[i] = self.result_cache.get(cache_keys[i])
+            trace.counters["cache_hits"] = sum(result is not None for result in results)
+            results = [None if result is None else result.with_trace(trace) for result in results]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            future.set_result(results)
+            return future
+
+        def finish(pending_results):
+            for i, result in zip(pending, pending_results):
+                results[i] = result
+                if cache_keys[i] is not None:
+                    self.result_cache.put(cache_keys[i], result.with_trace(None))
+            return results
+
+        task = ("run_many", r_script_path, ([input_sets[i] for i in pending], shared_inputs))
+        self._tasks.put((future, task, finish))
+        return future
+
+    def cancel(self, future: Future) -> bool:
+        """
+        Cancels a queued run, or kills the worker executing it (a replacement is started).
+        :return: True if the run was stopped.
+        """
+        if future.cancel():
+            return True
+        with self._lock:
+            slot = self._running.get(future)
+            if slot is None:
+                return False
+            worker = self._workers[slot]
+            if worker is None:
+                return False  # Being replaced, or the pool is shutting down
+            self._cancelled.add(future)
+            worker.process.kill()
+        return True
+
+    def memory_stats(self) -> dict:
+        """
+        :return: Memory each worker reported after its last run (pid, runs served, RSS), their total RSS, and
+                 the number of workers replaced for going over the memory limits.
+        """
+        with self._lock:
+            workers = [None if memory is None else {key: memory[key] for key in ("pid", "runs", "rss_mb")}
+                       for memory in self._worker_memory]
+            recycled_workers = self.recycled_workers
+        return {
+            "workers": workers,
+            "total_rss_mb": round(sum(worker["rss_mb"] or 0 for worker in workers if worker is not None), 1),
+            "recycled_workers": recycled_workers,
+        }
+
+    def startup_seconds(self) -> float:
+        """
+        :return: Seconds from creating the pool until every worker was ready, or None while still warming up.
+        """
+        with self._lock:
+            return None if self._ready_at is None else self._ready_at - self._created_at
+
+    def shutdown(self, wait: bool = True, timeout: float = 2):
+        """
+        Stops the pool. Queued runs are cancelled and workers executing a run are killed; idle or warming up
+        workers are asked to exit, and all of them are given one shared timeout before the rest are killed.
+        :param wait: Whether to block until the workers are gone, rather than reaping them on a background thread.
+        :param timeout: Seconds the workers get to exit in total.
+        """
+        with self._lock:
+            if self._shut_down:
+                return
+            self._shut_down = True
+            busy_slots = set(self._running.values())
+            self._cancelled.update(self._running)
+            workers = [(worker, slot in busy_slots) for slot, worker in enumerate(self._workers) if worker is not None]
+            self._workers = [None] * self.num_workers
+
+        # Runs still queued would never be picked up
+        while True:
+            try:
+                item = self._tasks.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[0].cancel()
+        for _ in self._dispatchers:
+            self._tasks.put(None)
+
+        for worker, busy in workers:
+            if busy:
+                worker.process.kill()
+            else:
+                worker.request_stop()
+        if wait:
+            self._reap(workers, timeout)
+        else:
+            threading.Thread(target=self._reap, args=(workers, timeout), daemon=True).start()
+
+    def _reap(self, workers, timeout):
+        deadline = time.monotonic() + timeout
+        for worker, _ in workers:
+            worker.join(deadline - time.monotonic())
+        for dispatcher in self._dispatchers:
+            dispatcher.join(max(0.0, deadline - time.monotonic()))
+
+    def _start_worker(self, slot):
+        with self._lock:
+            if self._shut_down:
+                return None
+            worker = self._workers[slot] = _RWorkerProcess(self._context, self.analysis_directory,
+                                                           self.compiled_script_directory, self.memory_limits,
+                                                           self.trace_r_memory)
+        try:
+            seconds = worker.wait_ready()
+        except (EOFError, OSError):
+            seconds = None  # Died while starting, the first task sent to it reports the error
+
+        with self._lock:
+            self.warm_up_seconds.append(seconds)
+            if len(self.warm_up_seconds) == self.num_workers:
+                self._ready_at = time.perf_counter()
+                self.ready.set()
+        return worker
+
+    def _dispatch(self, slot):
+        worker = self._start_worker(slot)
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                break
+            future, task, finish = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                self._running[future] = slot
+                worker = self._workers[slot]
+            try:
+                if worker is None:
+                    raise OSError("pool was shut down")
+                worker.connection.send(task)
+                status, payload, memory = worker.connection.recv()
+            except (EOFError, OSError) as e:
+                status, payload, memory = "error", f"R worker process died: {e}", None
+
+            with self._lock:
+                self._running.pop(future, None)
+                cancelled = future in self._cancelled
+                self._cancelled.discard(future)
+                if memory is not None:
+                    self._worker_memory[slot] = memory
+                replace_worker = worker is not None and (cancelled or not worker.process.is_alive())
+                if worker is not None and not replace_worker and memory is not None and memory["recycle"]:
+                    replace_worker = True
+                    self.recycled_workers += 1
+                if replace_worker:
+                    self._workers[slot] = None
+            if cancelled:
+                status, payload = "error", "Run was cancelled"
+
+            if status == "ok":
+                future.set_result(finish(payload))
+            else:
+                future.set_exception(RuntimeError(payload))
+
+            if replace_worker:
+                # The worker was killed by cancel(), crashed or went over its memory limits; the replacement
+                # warms up before the next task
+                worker.stop()
+                worker = self._start_worker(slot)
+
+        with self._lock:
+            worker = self._workers[slot]
+            self._workers[slot] = None
+        if worker is not None:
+            worker.stop()
 
 
 if __name__ == "__main__":
+    import numpy as np
+    import pandas as pd
+
     r_script_path = "analysis_files/testing_josh_analysis.R"
 
     container = RAnalysisContainer(r_script_path)
@@ -115,20 +1163,11 @@ if __name__ == "__main__":
 
     # Get input data
     df = pd.read_csv("some_data.txt", sep='\s+', header=None, names=["x", "y"])
-    y_values = df["y"].tolist()
-    x_values = df["x"].tolist()
-    new_x_values = [30]
-
-    output = container.run(y=y_values, x=x_values, new_x=new_x_values)
+    new_x_values = np.array([30.0])
 
-    # Combine formatted output string
-    full_result_string = ""
-    for key, value in output.items():
-        full_result_string += f"======== {key} ========\n"
-        section_string = '\n'.join(value)
-        full_result_string += f"{section_string}\n"
+    output = container.run(y=df["y"], x=df["x"], new_x=new_x_values)
 
     # Write to file
     with open("container_results.txt", "w") as f:
-        f.write(full_result_string)
+        f.write(output.to_text())
     print("Results written to container_results.txt")
@@ -0,0 +1,237 @@
+import hashlib
+import os
+import pickle
+import threading
+from array import array
+from collections import OrderedDict
+
+# Bumped whenever the shape of cached results or of their keys changes, so stale on-disk entries are never returned
+RESULT_FORMAT_VERSION = 3
+
+
+def _update_fingerprint(hasher, value):
+    """
+    Feeds one input value into the hasher. Numeric data is hashed straight from its buffer.
+    :raise TypeError: For values that can't be fingerprinted exactly.
+    """
+    # Imported here rather than at module level to keep application startup fast
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, str):
+        hasher.update(b"s" + value.encode("utf-8"))
+    elif isinstance(value, pd.DataFrame):
+        hasher.update(b"d")
+        for name, column in value.items():
+            hasher.update(str(name).encode("utf-8"))
+            _update_fingerprint(hasher, column)
+    elif isinstance(value, pd.Categorical):
+        hasher.update(b"c" + str(value.ordered).encode("ascii"))
+        _update_fingerprint(hasher, value.categories.to_numpy())
+        _update_fingerprint(hasher, value.codes)
+    elif isinstance(value, pd.Series):
+        if isinstance(value.dtype, pd.CategoricalDtype):
+            _update_fingerprint(hasher, value.array)
+        else:
+            _update_fingerprint(hasher, value.to_numpy())
+    elif isinstance(value, array):
+        _update_fingerprint(hasher, np.frombuffer(value, dtype=value.typecode))
+    elif isinstance(value, np.ndarray) and value.dtype.kind in "biuf":
+        hasher.update(f"n{value.dtype.str}{value.shape}".encode("ascii"))
+        hasher.update(memoryview(np.ascontiguousarray(value)).cast("B"))
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        values = np.asarray(value)
+        if values.dtype.kind in "biuf":
+            _update_fingerprint(hasher, values)
+        else:
+            # Every element in full; reprs of whole arrays are truncated
+            values = np.asarray(value, dtype=object)
+            items = values.ravel().tolist()
+            for item_type in set(map(type, items)):
+                if not issubclass(item_type, (str, bytes, int, float, np.generic, type(None))):
+                    raise TypeError(f"Unsupported input element type: {item_type}")
+            hasher.update(f"l{values.shape}".encode("ascii"))
+            hasher.update("\x1f".join(map(repr, items)).encode("utf-8"))
+    else:
+        raise TypeError(f"Unsupported input type: {type(value)}")
+
+
+def fingerprint_inputs(inputs: dict) -> str:
+    """
+    Computes a fast content fingerprint of a set of analysis inputs.
+    :param inputs: Keyword arguments of an analysis run.
+    :return: Hex digest identifying the inputs.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    for key in sorted(inputs):
+        hasher.update(b"\x00" + key.encode("utf-8") + b"\x00")
+        _update_fingerprint(hasher, inputs[key])
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 128, cache_directory: str = None, max_disk_bytes: int = 512 * 1024 ** 2):
+        """
+        Memoizes analysis results by script content hash and input fingerprint.
+        Results are kept in a bounded in-memory LRU and, when a directory is given, pickled to disk so
+        they survive restarts.
+        :param max_entries: Number of results kept in memory.
+        :param cache_directory: Directory for the on-disk tier, or None to keep results in memory only.
+        :param max_disk_bytes: Size of the on-disk tier, past which the least recently used results are removed.
+        """
+        self.max_entries = max_entries
+        self.cache_directory = cache_directory
+        self.max_disk_bytes = max_disk_bytes
+        if cache_directory:
+            os.makedirs(cache_directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._script_hashes = {}  # Script path -> ((mtime, size), content hash)
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = None  # Size of the on-disk tier, measured on the first write
+
+    def key_for(self, r_script_path: str, inputs: dict) -> str:
+        """
+        :return: Cache key for running the given script on the given inputs.
+        """
+        return f"v{RESULT_FORMAT_VERSION}-{self._script_hash(r_script_path)}-{fingerprint_inputs(inputs)}"
+
+    def get(self, key: str):
+        """
+        :return: The cached result for the key, or None on a miss.
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        result = self._read_from_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, result)
+        return result
+
+    def put(self, key: str, result):
+        with self._lock:
+            self._remember(key, result)
+        self._write_to_disk(key, result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.cache_directory:
+            with self._disk_lock:
+                for file_name in os.listdir(self.cache_directory):
+                    if file_name.endswith(".pkl"):
+                        os.remove(os.path.join(self.cache_directory, file_name))
+                self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _script_hash(self, r_script_path):
+        stat = os.stat(r_script_path)
+        script_stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._script_hashes.get(r_script_path)
+        if cached is not None and cached[0] == script_stamp:
+            return cached[1]
+
+        with open(r_script_path, "rb") as file:
+            script_hash = hashlib.sha256(file.read()).hexdigest()
+        with self._lock:
+            self._script_hashes[r_script_path] = (script_stamp, script_hash)
+        return script_hash
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_directory, f"{key}.pkl")
+
+    def _read_from_disk(self, key):
+        if not self.cache_directory:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as file:
+                result = pickle.load(file)
+            # The modification time orders entries for eviction, so reads count as uses
+            os.utime(self._disk_path(key))
+            return result
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print("Discarding unreadable cached result", key, ":", e)
+            return None
+
+    def _write_to_disk(self, key, result):
+        if not self.cache_directory:
+            return
+        # Write to a temporary file first so readers never see a partial pickle
+        temp_path = f"{self._disk_path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, self._disk_path(key))
+        except Exception as e:
+            print("Could not write cached result", key, ":", e)
+            return
+
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._measure_disk()
+            else:
+                self._disk_bytes += size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_from_disk()
+
+    def _measure_disk(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.cache_directory) if entry.name.endswith(".pkl"))
+
+    def _evict_from_disk(self):
+        """
+        Removes the least recently used results until the on-disk tier is back under 90% of its limit, so
+        eviction doesn't run again on the very next write.
+        """
+        entries = []
+        for entry in os.scandir(self.cache_directory):
+            if entry.name.endswith(".pkl"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._disk_bytes = total
@@ -0,0 +1,199 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from analysis_result import AnalysisResult
+
+FORMATS = ["txt", "jsonl", "csv", "parquet"]
+
+
+def numeric_table(result: AnalysisResult):
+    """
+    Flattens the numeric sections of a result (arrays, Series, DataFrames, and those nested in named lists)
+    into one long-format table with one row per value. Text sections are left out.
+    :return: DataFrame with section, row, column and value columns.
+    """
+    import pandas as pd
+
+    frames = [_numeric_frame(key, value) for key, value in result.items()]
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return pd.DataFrame({"section": pd.Series(dtype=object), "row": pd.Series(dtype=object),
+                             "column": pd.Series(dtype=object), "value": pd.Series(dtype="float64")})
+    return pd.concat(frames, ignore_index=True)
+
+
+def _numeric_frame(section, value):
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, dict):
+        frames = [_numeric_frame(f"{section}${name}", item) for name, item in value.items()]
+        frames = [frame for frame in frames if frame is not None]
+        return pd.concat(frames, ignore_index=True) if frames else None
+    if isinstance(value, np.ndarray) and value.dtype.kind in "biuf":
+        if value.ndim <= 1:
+            value = pd.Series(value.reshape(-1))
+        elif value.ndim == 2:
+            value = pd.DataFrame(value)
+        else:
+            value = pd.Series(value.reshape(-1), index=[str(index) for index in np.ndindex(value.shape)])
+    if isinstance(value, pd.Series) and pd.api.types.is_numeric_dtype(value.dtype):
+        value = value.to_frame(name="")
+    if not isinstance(value, pd.DataFrame):
+        return None
+
+    numeric = value.select_dtypes("number")
+    if numeric.empty:
+        return None
+    values = numeric.to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        "section": section,
+        "row": np.repeat(numeric.index.astype(str).to_numpy(), values.shape[1]),
+        "column": np.tile(numeric.columns.astype(str).to_numpy(), values.shape[0]),
+        "value": values.reshape(-1),
+    })
+
+
+class ResultWriter:
+    def __init__(self, output_directory: str, file_format: str = "txt", append: bool = False):
+        """
+        Writes analysis results to files on a background thread, in submission order.
+        Each run gets its own file, named <analysis>_results.<ext>, then <analysis>_results_2.<ext> and so on;
+        in append mode every run of this writer goes to one consolidated file instead.
+        :param output_directory: Directory the files are written to, created if needed.
+        :param file_format: One of FORMATS. csv and parquet only hold the numeric tables of each result.
+        :param append: Append all runs to one consolidated file.
+        """
+        if file_format not in FORMATS:
+            raise ValueError(f"Unknown result format: {file_format}")
+        self.output_directory = output_directory
+        self.file_format = file_format
+        self.append = append
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._next_suffix = None  # File stem -> next free numeric suffix, from one scan of the directory
+        self._run_count = 0
+        self._consolidated_path = None
+        self._parquet_writer = None
+        self._lock = threading.Lock()
+
+    def write(self, name: str, result: AnalysisResult) -> Future:
+        """
+        Queues a result for writing.
+        :return: Future resolving to the path the result was written to.
+        """
+        with self._lock:
+            self._run_count += 1
+            run = self._run_count
+        return self._executor.submit(self._write, name, run, result)
+
+    def close(self, wait: bool = True):
+        """
+        Closes the consolidated file, if any, on the writer thread once queued writes are done.
+        :param wait: Whether to block until then. Otherwise the writer finishes in the background (and the
+                     interpreter waits for it on exit).
+        """
+        self._executor.submit(self._close_consolidated)
+        self._executor.shutdown(wait=wait)
+
+    def _close_consolidated(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def _write(self, name, run, result):
+        os.makedirs(self.output_directory, exist_ok=True)
+        if self.append:
+            if self._consolidated_path is None:
+                stem = f"{time.strftime('%Y%m%d_%H%M%S')}_results"
+                file, self._consolidated_path = self._create_unique(stem)
+                file.close()
+            path = self._consolidated_path
+            mode = "a"
+        else:
+            file, path = self._create_unique(f"{name}_results")
+            file.close()
+            mode = "w"
+
+        try:
+            if self.file_format == "txt":
+                with open(path, mode) as f:
+                    if self.append:
+                        f.write(f"######## {name} ########\n")
+                    # Streamed section by section rather than rendering the whole text first
+                    for key in result:
+                        f.write(f"======== {key} ========\n")
+                        f.write("\n".join(result.section_lines(key)))
+                        f.write("\n")
+            elif self.file_format == "jsonl":
+                with open(path, mode) as f:
+                    record = {"analysis": name, "run": run, "results": result.to_json()}
+                    if result.trace is not None:
+                        record["trace"] = result.trace.to_record()
+                    f.write(json.dumps(record) + "\n")
+            else:
+                table = numeric_table(result)
+                table.insert(0, "analysis", name)
+                table.insert(1, "run", run)
+                if self.file_format == "csv":
+                    with open(path, mode, newline="") as f:
+                        table.to_csv(f, index=False, header=f.tell() == 0)
+                else:
+                    self._write_parquet(path, table)
+        except Exception:
+            if not self.append:
+                os.remove(path)  # Don't leave an empty or partial file behind
+            raise
+        return path
+
+    def _write_parquet(self, path, table):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Writing parquet files requires pyarrow")
+
+        schema = pyarrow.schema([("analysis", pyarrow.string()), ("run", pyarrow.int64()),
+                                 ("section", pyarrow.string()), ("row", pyarrow.string()),
+                                 ("column", pyarrow.string()), ("value", pyarrow.float64())])
+        arrow_table = pyarrow.Table.from_pandas(table, schema=schema, preserve_index=False)
+        if not self.append:
+            pyarrow.parquet.write_table(arrow_table, path)
+            return
+        # Parquet files can't be appended to once closed, so the consolidated file stays open until close()
+        if self._parquet_writer is None:
+            self._parquet_writer = pyarrow.parquet.ParquetWriter(path, arrow_table.schema)
+        self._parquet_writer.write_table(arrow_table)
+
+    def _create_unique(self, stem):
+        """
+        Creates a new file named after the stem without overwriting any existing one. The directory is
+        scanned once for the suffixes in use; afterwards each name is picked in O(1) and created exclusively.
+        :return: The open file and its path.
+        """
+        extension = self.file_format
+        if self._next_suffix is None:
+            self._next_suffix = {}
+            pattern = re.compile(rf"^(.*?)(?:_(\d+))?\.{re.escape(extension)}$")
+            with os.scandir(self.output_directory) as entries:
+                for entry in entries:
+                    match = pattern.match(entry.name)
+                    if match:
+                        suffix = int(match.group(2)) if match.group(2) else 1
+                        existing_stem = match.group(1)
+                        self._next_suffix[existing_stem] = max(self._next_suffix.get(existing_stem, 1), suffix + 1)
+
+        while True:
+            suffix = self._next_suffix.get(stem, 1)
+            self._next_suffix[stem] = suffix + 1
+            file_name = f"{stem}.{extension}" if suffix == 1 else f"{stem}_{suffix}.{extension}"
+            path = os.path.join(self.output_directory, file_name)
+            try:
+                # Exclusive creation, so a name taken behind our back is skipped rather than overwritten
+                return open(path, "x"), path
+            except FileExistsError:
+                continue
@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RunTrace:
+    def __init__(self, name: str, gc_timer=None):
+        """
+        Named timing spans recorded over one analysis run.
+        :param name: Name of the analysis being run.
+        :param gc_timer: Callable returning R's cumulative GC time in seconds, sampled around every span.
+        """
+        self.name = name
+        self.gc_timer = gc_timer
+        self.pid = os.getpid()
+        self.thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self.spans: list[dict] = []
+        self.counters: dict = {}
+
+        # Spans are timed with perf_counter and placed relative to the wall clock start
+        self._origin = time.perf_counter()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["gc_timer"] = None  # R callbacks don't cross process boundaries
+        return state
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """
+        Times the body of the with-block as a stage of the run.
+        :param name: Stage name.
+        :param args: Extra values stored with the span.
+        """
+        gc_before = self.gc_timer() if self.gc_timer else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if gc_before is not None:
+                args["r_gc_seconds"] = round(self.gc_timer() - gc_before, 6)
+            self.spans.append({
+                "name": name,
+                "start": start - self._origin,
+                "seconds": end - start,
+                "args": args,
+            })
+
+    @property
+    def total_seconds(self) -> float:
+        return max((span["start"] + span["seconds"] for span in self.spans), default=0.0)
+
+    def to_record(self) -> dict:
+        """
+        :return: The trace as a flat, JSON-serializable record for logs and reports.
+        """
+        return {
+            "analysis": self.name,
+            "pid": self.pid,
+            "started_at": self.started_at,
+            "total_seconds": round(self.total_seconds, 6),
+            "stages": [{"name": span["name"], "seconds": round(span["seconds"], 6), **span["args"]}
+                       for span in self.spans],
+            "counters": self.counters,
+        }
+
+    def chrome_trace_events(self) -> list[dict]:
+        """
+        :return: The spans as Chrome trace "complete" events, with timestamps in microseconds.
+        """
+        origin_us = self.started_at * 1e6
+        events = [{
+            "name": self.name, "cat": "run", "ph": "X", "pid": self.pid, "tid": self.thread_id,
+            "ts": origin_us, "dur": self.total_seconds * 1e6, "args": self.counters,
+        }]
+        for span in self.spans:
+            events.append({
+                "name": span["name"], "cat": "stage", "ph": "X", "pid": self.pid, "tid": self.thread_id,
+                "ts": origin_us + span["start"] * 1e6, "dur": span["seconds"] * 1e6, "args": span["args"],
+            })
+        return events
+
+    def summary(self) -> str:
+        """
+        :return: One line per stage, for display.
+        """
+        lines = [f"{self.name}: {self.total_seconds * 1000:.1f} ms"]
+        for span in self.spans:
+            extra = "".join(f", {key} {value}" for key, value in span["args"].items())
+            lines.append(f"  {span['name']:<18} {span['seconds'] * 1000:9.2f} ms{extra}")
+        lines.extend(f"  {key}: {value}" for key, value in self.counters.items())
+        return "\n".join(lines)
+
+
+def export_chrome_trace(traces: list[RunTrace], file_path: str):
+    """
+    Writes the traces as a Chrome trace file, viewable in chrome://tracing or Perfetto.
+    """
+    events = [event for trace in traces for event in trace.chrome_trace_events()]
+    with open(file_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
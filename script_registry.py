@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+
+from r_container import extract_function_arguments
+
+
+class ScriptRegistry:
+    def __init__(self, index_path: str = None):
+        """
+        Index of the .R scripts in analysis directories. Each script's mtime, size, content hash and input keys
+        are persisted, so rescanning a directory only stats files and re-reads the ones that changed.
+        :param index_path: JSON file the index is persisted to, or None to keep it in memory only.
+        """
+        self.index_path = index_path
+        self.entries: dict[str, dict] = {}  # Script path -> {"mtime_ns", "size", "hash", "input_keys"}
+        self.load()
+
+    def load(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print("Ignoring unreadable script index", self.index_path, ":", e)
+            self.entries = {}
+
+    def save(self):
+        if not self.index_path:
+            return
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.index_path)
+
+    def scripts_in(self, analysis_directory: str) -> dict[str, dict]:
+        """
+        :return: Indexed entries of the scripts directly inside the directory.
+        """
+        analysis_directory = os.path.normpath(analysis_directory)
+        return {path: entry for path, entry in self.entries.items() if os.path.dirname(path) == analysis_directory}
+
+    def scan(self, analysis_directory: str) -> tuple[list[str], list[str], list[str]]:
+        """
+        Brings the index for a directory up to date. Unchanged scripts cost one stat call; scripts whose
+        mtime or size changed are re-read, and only count as changed if their content hash differs.
+        Scripts without a recognizable process_data function are left out of the index.
+        :return: Paths of the added, removed and changed scripts.
+        """
+        analysis_directory = os.path.normpath(analysis_directory)
+        known_paths = set(self.scripts_in(analysis_directory))
+        added, changed = [], []
+        seen_paths = set()
+
+        with os.scandir(analysis_directory) as directory_entries:
+            for directory_entry in directory_entries:
+                if not directory_entry.name.endswith(".R") or not directory_entry.is_file():
+                    continue
+                path = os.path.normpath(directory_entry.path)
+                stat = directory_entry.stat()
+                entry = self.entries.get(path)
+                if entry is not None and (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns, stat.st_size):
+                    seen_paths.add(path)
+                    continue
+
+                try:
+                    with open(path, "r") as f:
+                        r_code = f.read()
+                    script_hash = hashlib.sha256(r_code.encode("utf-8")).hexdigest()
+                    input_keys = extract_function_arguments(r_code) \
+                        if entry is None or entry["hash"] != script_hash else entry["input_keys"]
+                except (OSError, ValueError) as e:
+                    print("Skipping analysis script", path, ":", e)
+                    continue
+
+                seen_paths.add(path)
+                if entry is None:
+                    added.append(path)
+                elif entry["hash"] != script_hash:
+                    changed.append(path)
+                self.entries[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": script_hash,
+                                      "input_keys": input_keys}
+
+        # Known scripts that are gone, or no longer define process_data, drop out of the index
+        removed = sorted(path for path in known_paths - seen_paths)
+        for path in removed:
+            del self.entries[path]
+        return sorted(added), removed, sorted(changed)
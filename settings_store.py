@@ -0,0 +1,141 @@
+import gzip
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, QSettings, QTimer, pyqtSignal
+
+
+class CoalescedSettings(QObject):
+    # Emitted from the snapshot thread when a snapshot has been written; handled on the GUI thread
+    _snapshots_written = pyqtSignal()
+
+    def __init__(self, settings: QSettings, snapshot_directory: str, interval_ms: int = 1000, parent=None):
+        """
+        Batches widget settings writes. Changed keys are only marked dirty, and written together once the
+        timer fires or on flush(). Large text values are kept out of QSettings: they are written as a
+        compressed snapshot file on a background thread, and QSettings only stores its path and hash.
+        :param settings: Settings backend that small values are written to.
+        :param snapshot_directory: Directory for the compressed snapshots.
+        :param interval_ms: How long writes are held back after the last change.
+        """
+        super().__init__(parent)
+        self.settings = settings
+        self.snapshot_directory = snapshot_directory
+
+        self._getters = {}  # Key -> callable returning the current value
+        self._snapshot_keys = set()
+        self._dirty = set()
+        self._snapshot_hashes = {}  # Key -> hash of the snapshot last written or loaded
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+
+        # One thread, so snapshots of the same key are written in order
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._written = []  # (key, path, hash) waiting to be recorded in QSettings
+        self._written_lock = threading.Lock()
+        self._closed = False
+        self._snapshots_written.connect(self._record_snapshots)
+
+    def track(self, key: str, getter):
+        """
+        Registers a small value, stored directly in QSettings.
+        :param getter: Callable returning the current value, only called when the key is flushed.
+        """
+        self._getters[key] = getter
+
+    def track_snapshot(self, key: str, getter):
+        """
+        Registers a large text value, stored as a compressed snapshot file referenced from QSettings.
+        :param getter: Callable returning the current text, only called when the key is flushed.
+        """
+        self._getters[key] = getter
+        self._snapshot_keys.add(key)
+
+    def mark_dirty(self, key: str):
+        self._dirty.add(key)
+        self._timer.start()
+
+    def discard(self, key: str):
+        """
+        Forgets a pending change, e.g. one caused by restoring the value itself.
+        """
+        self._dirty.discard(key)
+
+    def flush(self):
+        """
+        Writes every dirty value. Snapshots are compressed and written in the background.
+        """
+        self._timer.stop()
+        dirty, self._dirty = self._dirty, set()
+        for key in dirty:
+            value = self._getters[key]()
+            if key in self._snapshot_keys and self._closed:
+                self._write_snapshot(key, value)
+                self._record_snapshots()
+            elif key in self._snapshot_keys:
+                self._executor.submit(self._write_snapshot, key, value)
+            else:
+                self.settings.setValue(key, value)
+
+    def close(self):
+        """
+        Flushes, waits for snapshot writes to finish and syncs the settings backend.
+        """
+        self.flush()
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        self._record_snapshots()
+        self.settings.sync()
+
+    def load_snapshot(self, key: str) -> str:
+        """
+        :return: The text of the key's snapshot, or None if there is none or it doesn't match its recorded hash.
+        """
+        path = self.settings.value(f"{key}/snapshot", "")
+        expected_hash = self.settings.value(f"{key}/hash", "")
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, "rb") as f:
+                data = f.read()
+        except (OSError, EOFError) as e:
+            print("Ignoring unreadable snapshot", path, ":", e)
+            return None
+        if hashlib.blake2b(data, digest_size=16).hexdigest() != expected_hash:
+            print("Ignoring snapshot", path, "that doesn't match its recorded hash")
+            return None
+        self._snapshot_hashes[key] = expected_hash
+        return data.decode("utf-8")
+
+    def _write_snapshot(self, key, text):
+        data = text.encode("utf-8")
+        snapshot_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if self._snapshot_hashes.get(key) == snapshot_hash:
+            return
+        os.makedirs(self.snapshot_directory, exist_ok=True)
+        path = os.path.join(self.snapshot_directory, f"{key}.txt.gz")
+        temp_path = path + ".tmp"
+        try:
+            # Fastest compression level: snapshots are written often and read once per session
+            with gzip.open(temp_path, "wb", compresslevel=1) as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print("Could not write snapshot", path, ":", e)
+            return
+        self._snapshot_hashes[key] = snapshot_hash
+        with self._written_lock:
+            self._written.append((key, path, snapshot_hash))
+        self._snapshots_written.emit()
+
+    def _record_snapshots(self):
+        with self._written_lock:
+            written, self._written = self._written, []
+        for key, path, snapshot_hash in written:
+            self.settings.setValue(f"{key}/snapshot", path)
+            self.settings.setValue(f"{key}/hash", snapshot_hash)
@@ -57,6 +57,12 @@ class Ui_MainWindow(object):
         spacerItem = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
         self.analysis_selection_layout.addItem(spacerItem)
         self.verticalLayout.addLayout(self.analysis_selection_layout)
+        self.run_all_button = QtWidgets.QPushButton(MainWindow)
+        self.run_all_button.setObjectName("run_all_button")
+        self.verticalLayout.addWidget(self.run_all_button)
+        self.sweep_last_field_checkbox = QtWidgets.QCheckBox(MainWindow)
+        self.sweep_last_field_checkbox.setObjectName("sweep_last_field_checkbox")
+        self.verticalLayout.addWidget(self.sweep_last_field_checkbox)
         self.verticalLayout.setStretch(4, 1)
         self.horizontalLayout_2.addLayout(self.verticalLayout)
         self.verticalLayout_2 = QtWidgets.QVBoxLayout()
@@ -111,14 +117,52 @@ class Ui_MainWindow(object):
         self.parsed_input_tree_view = QtWidgets.QTreeView(MainWindow)
         self.parsed_input_tree_view.setObjectName("parsed_input_tree_view")
         self.verticalLayout_3.addWidget(self.parsed_input_tree_view)
+        self.column_stats_tree_view = QtWidgets.QTreeView(MainWindow)
+        self.column_stats_tree_view.setObjectName("column_stats_tree_view")
+        self.verticalLayout_3.addWidget(self.column_stats_tree_view)
         self.verticalLayout_3.setStretch(0, 3)
         self.verticalLayout_3.setStretch(1, 1)
+        self.verticalLayout_3.setStretch(2, 1)
         self.horizontalLayout_4.addLayout(self.verticalLayout_3)
         self.verticalLayout_4 = QtWidgets.QVBoxLayout()
         self.verticalLayout_4.setObjectName("verticalLayout_4")
         self.output_text_edit = QtWidgets.QPlainTextEdit(MainWindow)
+        self.output_text_edit.setUndoRedoEnabled(False)
         self.output_text_edit.setObjectName("output_text_edit")
         self.verticalLayout_4.addWidget(self.output_text_edit)
+        self.run_status_layout = QtWidgets.QHBoxLayout()
+        self.run_status_layout.setObjectName("run_status_layout")
+        self.run_status_label = QtWidgets.QLabel(MainWindow)
+        self.run_status_label.setObjectName("run_status_label")
+        self.run_status_layout.addWidget(self.run_status_label)
+        self.run_timeout_label = QtWidgets.QLabel(MainWindow)
+        self.run_timeout_label.setObjectName("run_timeout_label")
+        self.run_status_layout.addWidget(self.run_timeout_label)
+        self.run_timeout_spin_box = QtWidgets.QSpinBox(MainWindow)
+        self.run_timeout_spin_box.setMaximum(86400)
+        self.run_timeout_spin_box.setObjectName("run_timeout_spin_box")
+        self.run_status_layout.addWidget(self.run_timeout_spin_box)
+        self.load_more_output_button = QtWidgets.QPushButton(MainWindow)
+        self.load_more_output_button.setEnabled(False)
+        self.load_more_output_button.setObjectName("load_more_output_button")
+        self.run_status_layout.addWidget(self.load_more_output_button)
+        self.cancel_runs_button = QtWidgets.QPushButton(MainWindow)
+        self.cancel_runs_button.setObjectName("cancel_runs_button")
+        self.run_status_layout.addWidget(self.cancel_runs_button)
+        self.export_trace_button = QtWidgets.QPushButton(MainWindow)
+        self.export_trace_button.setObjectName("export_trace_button")
+        self.run_status_layout.addWidget(self.export_trace_button)
+        self.run_status_layout.setStretch(0, 1)
+        self.verticalLayout_4.addLayout(self.run_status_layout)
+        self.run_metrics_text_edit = QtWidgets.QPlainTextEdit(MainWindow)
+        self.run_metrics_text_edit.setMaximumSize(QtCore.QSize(16777215, 110))
+        font = QtGui.QFont()
+        font.setFamily("Consolas")
+        font.setPointSize(8)
+        self.run_metrics_text_edit.setFont(font)
+        self.run_metrics_text_edit.setReadOnly(True)
+        self.run_metrics_text_edit.setObjectName("run_metrics_text_edit")
+        self.verticalLayout_4.addWidget(self.run_metrics_text_edit)
         self.save_to_file_checkbox = QtWidgets.QCheckBox(MainWindow)
         font = QtGui.QFont()
         font.setPointSize(9)
@@ -133,6 +177,16 @@ class Ui_MainWindow(object):
         self.output_file_path_line_edit = QtWidgets.QLineEdit(MainWindow)
         self.output_file_path_line_edit.setObjectName("output_file_path_line_edit")
         self.save_to_file_layout.addWidget(self.output_file_path_line_edit)
+        self.output_format_combo_box = QtWidgets.QComboBox(MainWindow)
+        self.output_format_combo_box.setObjectName("output_format_combo_box")
+        self.output_format_combo_box.addItem("")
+        self.output_format_combo_box.addItem("")
+        self.output_format_combo_box.addItem("")
+        self.output_format_combo_box.addItem("")
+        self.save_to_file_layout.addWidget(self.output_format_combo_box)
+        self.append_results_checkbox = QtWidgets.QCheckBox(MainWindow)
+        self.append_results_checkbox.setObjectName("append_results_checkbox")
+        self.save_to_file_layout.addWidget(self.append_results_checkbox)
         spacerItem2 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
         self.save_to_file_layout.addItem(spacerItem2)
         self.save_to_file_layout.setStretch(1, 2)
@@ -155,10 +209,26 @@ class Ui_MainWindow(object):
         self.label.setText(_translate("MainWindow", "Analysis Directory (R Files)"))
         self.analysis_directory_browse_button.setText(_translate("MainWindow", "Browse"))
         self.analysis_types_label.setText(_translate("MainWindow", "Selected Analysis Types"))
+        self.run_all_button.setText(_translate("MainWindow", "Run All Enabled Analyses"))
+        self.sweep_last_field_checkbox.setToolTip(_translate("MainWindow", "Run each value of the last field as a separate input set, in one batch per analysis"))
+        self.sweep_last_field_checkbox.setText(_translate("MainWindow", "Sweep Last Field"))
         self.label_2.setText(_translate("MainWindow", "Upload Data"))
         self.data_file_browse_button.setText(_translate("MainWindow", "Browse"))
         self.load_from_file_button.setText(_translate("MainWindow", "Load Data from Selected File"))
         self.label_4.setText(_translate("MainWindow", "Input Data"))
         self.label_3.setText(_translate("MainWindow", "Output Data"))
+        self.run_status_label.setText(_translate("MainWindow", "Idle"))
+        self.run_timeout_label.setText(_translate("MainWindow", "Timeout (s)"))
+        self.run_timeout_spin_box.setSpecialValueText(_translate("MainWindow", "None"))
+        self.load_more_output_button.setText(_translate("MainWindow", "Load More"))
+        self.cancel_runs_button.setText(_translate("MainWindow", "Cancel Runs"))
+        self.export_trace_button.setText(_translate("MainWindow", "Export Trace"))
         self.save_to_file_checkbox.setText(_translate("MainWindow", "Save to File"))
         self.output_file_browse_button.setText(_translate("MainWindow", "Browse"))
+        self.output_format_combo_box.setToolTip(_translate("MainWindow", "File format; CSV and Parquet hold the numeric tables of each result"))
+        self.output_format_combo_box.setItemText(0, _translate("MainWindow", "txt"))
+        self.output_format_combo_box.setItemText(1, _translate("MainWindow", "jsonl"))
+        self.output_format_combo_box.setItemText(2, _translate("MainWindow", "csv"))
+        self.output_format_combo_box.setItemText(3, _translate("MainWindow", "parquet"))
+        self.append_results_checkbox.setToolTip(_translate("MainWindow", "Append every run of this session to one consolidated file"))
+        self.append_results_checkbox.setText(_translate("MainWindow", "Append to One File"))